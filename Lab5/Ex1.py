@@ -1,49 +1,65 @@
-import random
+import os
+import sys
 
-def sample_reads_full_coverage(sequence, num_reads=2000, min_len=100, max_len=150):
-    seq_len = len(sequence)
-    reads = []
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bioinf.assembly import assemble, assembly_stats
+from bioinf.mapper import KmerIndex, map_reads, placed_reads
+from bioinf.pileup import Pileup
+from bioinf.simulate import sample_reads
 
-    avg_spacing = max(1, (seq_len - max_len) // (num_reads - 1))
+def sample_reads_full_coverage(sequence, num_reads=2000, min_len=100, max_len=150, seed=None):
+    # forward-strand, error-free reads: the first ones tile the sequence from the first
+    # to the last base, the rest land at random starts
+    return sample_reads(sequence, num_reads, min_len=min_len, max_len=max_len,
+                        reverse_fraction=0.0, tile=True, seed=seed)
 
-    for i in range(num_reads):
-        start = i * avg_spacing
-        if start > seq_len - max_len:
-            start = seq_len - max_len
-        read_len = random.randint(min_len, max_len)
-        read = sequence[start:start + read_len]
-        reads.append((start, read))
+def sample_reads_random(sequence, num_reads=2000, min_len=100, max_len=150, seed=None):
+    # random starts on both strands, no coverage guarantee; see bioinf.simulate for
+    # errors, paired-end reads and FASTQ output
+    return sample_reads(sequence, num_reads, min_len=min_len, max_len=max_len, seed=seed)
 
-    return reads
-
-def reconstruct_from_reads(reads, seq_len):
+def reconstruct_from_reads(reads, seq_len, batch_size=200):
     print("Sorting reads by start position...")
     reads.sort(key=lambda x: x[0])
     print("Reads sorted.\n")
 
-    reconstructed = [''] * seq_len
+    pileup = Pileup(seq_len)
     total_reads = len(reads)
-    coverage_count = 0
 
     print("Reconstructing DNA sequence...")
-    for idx, (start, read) in enumerate(reads):
-        for i, base in enumerate(read):
-            pos = start + i
-            if pos < seq_len and reconstructed[pos] == '':
-                coverage_count += 1
-            if pos < seq_len:
-                reconstructed[pos] = base
-        if (idx+1) % 200 == 0 or idx+1 == total_reads:
-            percent = coverage_count / seq_len * 100
-            print(f"  Processed {idx+1}/{total_reads} reads — coverage: {percent:.2f}%")
+    for idx in range(0, total_reads, batch_size):
+        pileup.add(reads[idx:idx + batch_size])
+        percent = pileup.covered() / seq_len * 100
+        print(f"  Processed {pileup.reads}/{total_reads} reads — coverage: {percent:.2f}%")
     print("Reconstruction completed.\n")
 
+    depth = pileup.depth()
+    gap_starts, gap_ends = pileup.gaps()
+    print(f"Mean depth: {depth.mean():.1f}x, minimum depth: {depth.min()}")
+    for gap_start, gap_end in zip(gap_starts, gap_ends):
+        print(f"  Uncovered positions {gap_start}-{gap_end} (reported as N)")
+
+    return pileup.consensus()
 
-    for i in range(1, seq_len):
-        if reconstructed[i] == '':
-            reconstructed[i] = reconstructed[i-1]
+def map_to_reference(reads, reference, k=15):
+    # forgets the true starts and places the reads again with the k-mer mapper
+    print("Mapping reads to the reference...")
+    sequences = [read for _, read in reads]
+    mapping = map_reads(KmerIndex.build(reference, k), sequences)
+    placed = placed_reads(sequences, mapping)
+    print(f"  Mapped {len(placed)}/{len(reads)} reads")
+    print("Mapping completed.\n")
+    return placed
 
-    return ''.join(reconstructed)
+def assemble_de_novo(reads, k=31):
+    # ignores the read start positions and rebuilds the sequence from k-mer overlaps
+    print("Assembling reads de novo...")
+    contigs = assemble([read for _, read in reads], k=k)
+    stats = assembly_stats(contigs)
+    print(f"  Contigs: {stats['contigs']}, total length: {stats['total_length']}, "
+          f"longest: {stats['longest']}, N50: {stats['n50']}")
+    print("De novo assembly completed.\n")
+    return [seq for seq, _ in contigs]
 
 
 original = "CGATCCTCCGCTAAGATATTCTTACGTGTAACGTAGCTATGTATTTTACAGAGCTGGCGTACGCGTTGAACACTTCACAGATGATAGGGATTCGGGTAAAGAGCGTGTTATTGGGGACTTACACAGGCGTAGACTACAATGGGCCCAACTCAATCACAGCTCGAGCGCCTTGAATAACGTACTCATCTCTATACATTCTCGACAATCTATCGAGCGACTCGATTATCAACGGGTGTCTTGCAGTTCTAATCTCTTGCCAGCATCGTAATAGCCTCCAAGAGATTGATGATAGTCATGGGCACAGAGCTGAGACGGCGCCGATGGATAGCGGACTTTCGGTCAACCACAATTCCCCACGAGACAGGTCCTGCCGTGCGCATCACTCTGAATGTACAAGCAACCCAAGAGGGCTGAGCCTGGACTCAGCTGGTTCCTGGGTGAGCTCGAGACTCGGGGTGACAGCTCTTCATACATAGAGCGGGGGCGTCGAACGGTCGTGAAAGTCATAGTACCCCGGGTACCAACTTACTGAGGATATTGCTTGAAGCTGTACCGTTTTAGGGGGGGAACGCTGAAGATCTCTTCTTCTCATGACTGAACTCGCGAGGGTCGTGATGTCGGTTCCTTCAAAGGTTAAAGAACAAAGGCTTACTGTGCGCAGAGGAACGCCCATTTAGCGGCTGGCGTCTTGAATCCTCGGTCCCCCTTGTCTTTCCAGATTAATCCATTTCCCTCATTCACGAGCTTACCAAGTCAACATTGGTATATGAATGCGACCTTGAAGAGGCCGCTTAAAAATGGCAGTGGTTGATGCTCTAAACTCCATTTGGTTAACTCGTGTATCACCGCGATAGGCTGATAGAGGTTTAATATTGTATAGCAAGGTACTTCCGGTCTCAATGAATGGCCGGGAAAGGTACGCGCGCGGTATGGGAGGGTCAAGGGGCCAATAGAGAGGCTCCTCTCTCACTCGCTAGGAGGCAATTGTATAACAATGCTTACTGCATCGATACATAAAACGTGTCCATCGGTTGCCCAAACTGTGAAGTGTCTATCACCCCTAGGCCCGTTTCCCGCATATAAACGCCAGGTTGTATCCGCATTTGATGCTACCGTGGATGAGTCAGCGTCGAGCACGCGGCACTTATTGCATGAGTAGGGTTGACTAAGAGCCGTTAGATGCCTCGCTGTACTAATAGTTGTCGACAGATCGTCAAGATTAGAAAACGGTACCAGCATTTTCGGAGGTTCTCTAACTAGTATGGATAGCCGTGTCTTCACTGTGCTGCGGCTACCCATCGCCTGAAATCCAGTTGGTGTCAAGCCATCCCCTGTCCAGGACGCCGCATGTAGTGAAACATACACGTTGCTCGGGTTCACCCCGGTCCGTTCTGAGTCGACCAAGGACACAATCGAGCTCCGATCCGTACTGTCGAGAAACTTGTATCCGACCCCCGCAGCTTGCCAGCTCTTCGGGTATCATGGAGCCTATGGTTGAACGTGTCCGATAACGAACTTCGACATGATAAAGTCCCCCCCTCGCGACTACCAGAGAAGAAGACTACTGAGTTGAGCGTTCCCAGCACTTCAGCCAAGGAAGCTACCAATTTTTAGTTTCCGAGTGTCACGTCTGACCTCGCGGGTAGATTGCCGAGCGTAGAGCTTACGAGCCAGCGGAAACAGTAAGGCCTTTTTAAGTATGGGGAGTAAGTGATCGAACGCTTCAGATGTGACCATATACTTAGGCTGGATCTCGTCCCGTGAATTTTAACCCTCACCAACTACGAGATATGAGGTAAGCCAAAAAAGCACGTGGTGGCGCTCACCGACTGTTCCCAAACTGTAACTCATCGTTCCGTCAAGGCCTGACTTACTTCCCGGCCCTTTCCATGCGCGGACCATACCGTCCTAGTTCTTCGGTTATGTTTCCGATGTAGGAGTGAGCCTACCTCCGTTTGCGTCTTGTTACCAATGAAAAAGCTATGCACTTTGTACAGGGTGCCATCGGGTTTCTGAACTCTCAGATAGTGGGGATCCCGGGAAAGGGCCTATATTTGCGGTCCAACTTAGGCGTAAACCTCGATGCTACCTACTCAGACCCACCCCGCGCGGGGTAAATATGGCACTCATCCCAGCTGGTTCTTGGCGTTCTACGCAGCCACATGTTCATTAACAGTTGTCTGGTAGCACAAAAGTATTACCATGGTCCTAGAAGCCCGGCAGAGTTAGTTCGAACCTAATGCCACAAATGAGACAGGACGCCAATGGGTACCGGACATTAGGTCGAGCTCAGTTCGGTAACGGAGAGACCCTGCGGCGTACTTAATTATGCATATGAAACGCGCCCAAGTGACGCCAGGCAAGTCTCAGCAGGTTCCCGTGTTAGCTCGAGGGTAAACATACAAGCCGATTGAACATGGGTTGGGGGCTTCAAATCGTCGAGGACCCCACAGTACCTCGGAGACCAAGTAGGGCACCCTATAGTTCGAAGCAGAACTAT"
@@ -55,3 +71,12 @@ print("Original length:", len(original))
 print("Number of reads:", len(reads))
 print("Reconstructed length:", len(reconstructed))
 print("Reconstruction successful?", reconstructed == original)
+
+contigs = assemble_de_novo(sample_reads_random(original))
+complement = str.maketrans("ACGT", "TGCA")
+print("Longest contig found in original?",
+      bool(contigs) and (contigs[0] in original or contigs[0][::-1].translate(complement) in original))
+
+mapped = map_to_reference(reads, original)
+print("Reconstruction from mapped reads successful?",
+      reconstruct_from_reads(mapped, len(original)) == reconstructed)
@@ -1,46 +1,21 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import matplotlib.pyplot as plt
 
-def cg_percent(window):
-    count = sum(1 for b in window if b in "CG")
-    return (count / len(window)) * 100
-
-def kappa_ic(window):
-    n = len(window)
-    total = 0
-
-    for shift in range(1, n):
-        matches = 0
-        L = n - shift
-        for i in range(L):
-            if window[i] == window[i+shift]:
-                matches += 1
-        total += (matches / L) * 100
-
-    return total / (n - 1)
-
-def read_fasta(path):
-    seq = ""
-    with open(path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line.startswith(">"):
-                seq += line.upper()
-    return seq
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from bioinf.cache import cached_records
+from bioinf.windows import gc_profile, kappa_ic_profile
 
 def compute_stain(seq, window=30):
-    cg_vals = []
-    ic_vals = []
-    for start in range(0, len(seq) - window + 1):
-        w = seq[start:start + window]
-        cg_vals.append(cg_percent(w))
-        ic_vals.append(kappa_ic(w))
+    cg_vals = gc_profile(seq, window)
+    ic_vals = kappa_ic_profile(seq, window)
     return cg_vals, ic_vals
 
 def select_files():
     files = filedialog.askopenfilenames(title="Select up to 10 influenza genomes",
-                                        filetypes=[("FASTA files", "*.fasta *.fa *.txt")])
+                                        filetypes=[("FASTA files", "*.fasta *.fa *.txt *.gz")])
 
     if not files:
         return
@@ -62,12 +37,16 @@ def run_analysis():
 
     for i in range(file_list.size()):
         filepath = file_list.get(i)
-        seq = read_fasta(filepath)
         name = filepath.split("/")[-1]
 
         print("Processing:", name)
 
-        cg_vals, ic_vals = compute_stain(seq)
+        # windows per record (segment), so none straddles two segments
+        cg_vals, ic_vals = [], []
+        for _, seq in cached_records(filepath):
+            cg, ic = compute_stain(seq)
+            cg_vals.extend(cg)
+            ic_vals.extend(ic)
 
         plt.scatter(cg_vals, ic_vals, s=5)
         plt.title(f"Digital Stain — {name}")
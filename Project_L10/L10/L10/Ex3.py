@@ -1,55 +1,19 @@
 import os
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from bioinf.fasta import read_fasta_records
+from bioinf.windows import gc_profile, kappa_ic_profile
+
 WINDOW = 30
 OUTPUT_FOLDER = "ODS"
 
-def read_fasta_multi(path):
-    seqs = {}
-    name = None
-    cur = []
-
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith(">"):
-                if name:
-                    seqs[name] = "".join(cur).upper()
-                name = line[1:].strip()
-                cur = []
-            else:
-                cur.append(line)
-        if name:
-            seqs[name] = "".join(cur).upper()
-
-    return seqs
-
-def cg_percent(win):
-    return 100 * sum(b in "CG" for b in win) / len(win)
-
-def kappa_ic(win):
-    n = len(win)
-    total = 0
-
-    for shift in range(1, n):
-        matches = 0
-        L = n - shift
-        for i in range(L):
-            if win[i] == win[i + shift]:
-                matches += 1
-        total += (matches / L) * 100
-
-    return total / (n - 1)
-
 def compute_stain(seq):
-    cg_vals, ic_vals = [], []
-
-    for start in range(0, len(seq) - WINDOW + 1):
-        w = seq[start:start + WINDOW]
-        cg_vals.append(cg_percent(w))
-        ic_vals.append(kappa_ic(w))
+    cg_vals = gc_profile(seq, WINDOW)
+    ic_vals = kappa_ic_profile(seq, WINDOW)
 
     return cg_vals, ic_vals
 
@@ -60,14 +24,12 @@ def generate_ods():
         messagebox.showerror("Error", "Please select a valid FASTA file.")
         return
 
-    promoters = read_fasta_multi(fasta_path)
-
     if not os.path.exists(OUTPUT_FOLDER):
         os.makedirs(OUTPUT_FOLDER)
 
     centers = []
 
-    for name, seq in promoters.items():
+    for name, seq in read_fasta_records(fasta_path):
         print("Processing:", name)
 
         cg_vals, ic_vals = compute_stain(seq)
@@ -107,7 +69,7 @@ def generate_ods():
 
 def browse_fasta():
     path = filedialog.askopenfilename(title="Select Promoter FASTA File",
-                                      filetypes=[("FASTA files", "*.fasta *.fa *.txt")])
+                                      filetypes=[("FASTA files", "*.fasta *.fa *.txt *.gz")])
     if path:
         fasta_entry.delete(0, tk.END)
         fasta_entry.insert(0, path)
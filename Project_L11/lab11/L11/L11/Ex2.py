@@ -1,17 +1,12 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import filedialog, ttk
 import matplotlib.pyplot as plt
 import math
 
-def read_fasta_first_sequence(path):
-    seq = []
-    with open(path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith(">"):
-                continue
-            seq.append(line.upper())
-    return "".join(seq)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", ".."))
+from bioinf.faidx import IndexedFasta
 
 def smith_waterman_score(s1, s2, match=2, mismatch=-1, gap=-2):
     n = len(s1)
@@ -92,11 +87,12 @@ def smith_waterman_alignment(s1, s2, match=2, mismatch=-1, gap=-2):
     aligned2.reverse()
     return "".join(aligned1), "".join(aligned2), max_score
 
-def split_into_windows(seq, window_size, step):
-    windows = []
-    for start in range(0, len(seq) - window_size + 1, step):
-        windows.append((start, seq[start:start + window_size]))
-    return windows
+def split_into_windows(record, window_size, step):
+    # (start, window) pairs read one at a time from the indexed file
+    yield from record.windows(window_size, step)
+
+def count_windows(length, window_size, step):
+    return max(0, (length - window_size) // step + 1)
 
 def choose_files_window():
     root = tk.Tk()
@@ -149,20 +145,20 @@ def main():
 
     print("\nReading genomes...\n")
 
-    influenza = read_fasta_first_sequence(influenza_file)
-    covid = read_fasta_first_sequence(covid_file)
+    # windows are read straight from the memory-mapped files through the .fai index
+    with IndexedFasta(influenza_file) as influenza_fasta, IndexedFasta(covid_file) as covid_fasta:
+        compare_genomes(influenza_fasta[0], covid_fasta[0])
+
 
+def compare_genomes(influenza, covid):
     print("Influenza length:", len(influenza))
     print("COVID-19 length:", len(covid))
 
     window_size = 200
     step = 200
 
-    influenza_windows = split_into_windows(influenza, window_size, step)
-    covid_windows = split_into_windows(covid, window_size, step)
-
-    n1 = len(influenza_windows)
-    n2 = len(covid_windows)
+    n1 = count_windows(len(influenza), window_size, step)
+    n2 = count_windows(len(covid), window_size, step)
 
     print("\nWindows (Influenza):", n1)
     print("Windows (COVID-19):", n2)
@@ -177,8 +173,8 @@ def main():
     mismatch = -1
     gap = -2
 
-    for i, (_, w1) in enumerate(influenza_windows):
-        for j, (_, w2) in enumerate(covid_windows):
+    for i, (_, w1) in enumerate(split_into_windows(influenza, window_size, step)):
+        for j, (_, w2) in enumerate(split_into_windows(covid, window_size, step)):
 
             score = smith_waterman_score(w1, w2, match, mismatch, gap)
             max_possible = match * min(len(w1), len(w2))
@@ -200,8 +196,10 @@ def main():
     plt.tight_layout()
     plt.show()
 
-    start1, w1 = influenza_windows[best_i]
-    start2, w2 = covid_windows[best_j]
+    start1 = best_i * step
+    start2 = best_j * step
+    w1 = influenza[start1:start1 + window_size]
+    w2 = covid[start2:start2 + window_size]
 
     aligned1, aligned2, true_score = smith_waterman_alignment(w1, w2)
 
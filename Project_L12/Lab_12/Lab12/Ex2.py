@@ -1,7 +1,14 @@
+import os
+import sys
 import tkinter as tk
 from tkinter import filedialog
 import matplotlib.pyplot as plt
 import math
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from bioinf.cache import cached_records
+from bioinf.packed import encode
 
 motifs = [
     "GTCATTACTA",
@@ -90,30 +97,21 @@ for pos, w, sc in scores:
         print(f"pos {pos:2d}: {w}   score = {sc:.3f}")
 
 
-# FASTA reader
-def read_fasta(filepath):
-    sequence = ""
-    with open(filepath, "r") as f:
-        for line in f:
-            if not line.startswith(">"):
-                sequence += line.strip().upper()
-    return sequence
-
 #Scan genome
 def scan_genome(sequence, ll, L):
-    scores = []
-    for i in range(len(sequence) - L + 1):
-        window = sequence[i:i+L]
-        score = 0.0
-        valid = True
+    codes = encode(sequence)
+    m = len(codes) - L + 1
+    if m <= 0:
+        return np.zeros(0)
 
-        for pos, base in enumerate(window):
-            if base not in ll:
-                valid = False
-                break
-            score += ll[base][pos]
+    # one row per motif position, indexed by base code; ambiguous bases score NaN
+    table = np.full((L, 5), np.nan)
+    for b_idx, b in enumerate(bases):
+        table[:, b_idx] = ll[b]
 
-        scores.append(score if valid else None)
+    scores = np.zeros(m)
+    for pos in range(L):
+        scores += table[pos][codes[pos:pos + m]]
 
     return scores
 
@@ -132,12 +130,15 @@ def plot_signal(scores, genome_name):
 def select_fasta_files():
     filepaths = filedialog.askopenfilenames(
         title="Select influenza FASTA files",
-        filetypes=[("FASTA files", "*.fasta *.fa *.txt")]
+        filetypes=[("FASTA files", "*.fasta *.fa *.txt *.gz")]
     )
 
     for path in filepaths:
-        sequence = read_fasta(path)
-        scores = scan_genome(sequence, ll, L)
+        # each record scanned on its own, with a NaN gap between records in the plot
+        scores = []
+        for _, sequence in cached_records(path):
+            scores.extend([scan_genome(sequence, ll, L), np.full(1, np.nan)])
+        scores = np.concatenate(scores[:-1]) if scores else np.zeros(0)
         genome_name = path.split("/")[-1]
         plot_signal(scores, genome_name)
 
@@ -6,41 +6,47 @@
 #4. Simulate the migration of these DNA segments on the electrophoresis gel, based on their molecular weights - however, their length should be sufficient for this exercise (show a visual representation).
 
 
+import os
 import random
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from bioinf.cache import cached_records
+from bioinf.gel import ladder_ticks, lane_centers, render_gel, write_png
+
 def read_fasta_via_dialog():
     root = tk.Tk()
     root.withdraw()
 
     filepath = filedialog.askopenfilename(
         title="Select FASTA file",
-        filetypes=(("FASTA files", "*.fasta"), ("All files", "*.*"))
+        filetypes=(("FASTA files", "*.fasta *.gz"), ("All files", "*.*"))
     )
     if not filepath:
         print("No file selected.")
-        return ""
+        return filepath, []
 
     try:
-        with open(filepath, "r") as f:
-            lines = f.readlines()
-        seq = "".join(line.strip() for line in lines if not line.startswith(">")).upper()
-        return seq
+        # one string per record, so no fragment spans two records
+        return filepath, [str(seq) for _, seq in cached_records(filepath)]
     except Exception as e:
         messagebox.showerror("Error", f"Failed to read file:\n{e}")
-        return ""
+        return filepath, []
 
-def simulate_and_plot(seq, n_fragments=10):
-    n = len(seq)
-    if n < 100:
+def simulate_and_plot(records, n_fragments=10, png_path=None):
+    records = [seq for seq in records if len(seq) >= 100]
+    if not records:
         messagebox.showerror("Error", "Sequence too short (need at least 100 bp).")
         return
 
     fragments = []
     lengths = []
     for _ in range(n_fragments):
+        seq = random.choice(records)
+        n = len(seq)
         frag_len = random.randint(100, min(3000, n))
         start = random.randint(0, n - frag_len)
         frag = seq[start:start + frag_len]
@@ -49,26 +55,24 @@ def simulate_and_plot(seq, n_fragments=10):
 
     print("Fragment lengths (bp):", lengths)
 
-    K = 1000.0
-    distances = [K / L for L in lengths]
-
-    plt.figure(figsize=(6, 8))
-    lane_x = 1.0
-
-    for L, d in zip(lengths, distances):
-        plt.plot([lane_x - 0.4, lane_x + 0.4], [d, d], linewidth=6)
-        plt.text(lane_x + 0.5, d, f"{L} bp", va="center", fontsize=9)
+    # log-linear migration calibrated on a 1 kb ladder; band brightness follows DNA mass
+    image = render_gel([lengths])
+    if png_path:
+        write_png(png_path, image)
+        print(f"Gel image written to {png_path}")
 
-    plt.gca().invert_yaxis()
+    rows, sizes = ladder_ticks()
+    plt.figure(figsize=(4, 8))
+    plt.imshow(image, cmap="gray", aspect="auto")
+    plt.yticks(rows, sizes, fontsize=8)
+    plt.xticks(lane_centers(2), ["Ladder", "Sample"])
     plt.title("Simulated Gel Electrophoresis")
-    plt.xlabel("Lane")
-    plt.ylabel("Migration distance (a.u.)")
-    plt.xlim(0, 2)
-    plt.ylim(0, max(distances) + 10)
     plt.tight_layout()
     plt.show()
 
 if __name__ == "__main__":
-    sequence = read_fasta_via_dialog()
-    if sequence:
-        simulate_and_plot(sequence, n_fragments=10)
+    filepath, records = read_fasta_via_dialog()
+    if records:
+        # the image goes next to the FASTA it was simulated from
+        png_path = os.path.join(os.path.dirname(os.path.abspath(filepath)), "gel_simulation.png")
+        simulate_and_plot(records, n_fragments=10, png_path=png_path)
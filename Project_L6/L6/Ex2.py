@@ -2,30 +2,35 @@
 # make a comparison between the 10 electroph gel simulation and show which of the influenza genomes show the most DNA segments. 
 # you can plot them in the same graph, but also separately, because the lines may overlap. as the main restriction enzyme phase use ECOR1
 
+import argparse
+import csv
+import os
+import sys
 import tkinter as tk
 from tkinter import filedialog
 import matplotlib.pyplot as plt
 
-ECO_RI_SITE = "GAATTC"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from bioinf.digest import ENZYMES, batch_digest
+from bioinf.gel import ladder_ticks, lane_centers, render_gel, write_png
+from bioinf.site_index import genome_site_index
 
-def read_fasta(path):
-    with open(path, "r") as f:
-        lines = f.readlines()
-    seq = "".join(line.strip() for line in lines if not line.startswith(">")).upper()
-    return seq
+ECO_RI = {"EcoRI": ENZYMES["EcoRI"]}
 
-def digest_sequence(seq, site=ECO_RI_SITE):
-    fragments = seq.split(site)
-    fragment_lengths = [len(f) for f in fragments if len(f) > 0]
-    return fragment_lengths
-
-def simulate_gel(lengths, lane_number, label):
-    K = 1000.0
-    distances = [K / L for L in lengths]
-    for d, L in zip(distances, lengths):
-        plt.plot([lane_number - 0.3, lane_number + 0.3], [d, d], linewidth=5)
-        plt.text(lane_number + 0.4, d, f"{L} bp", fontsize=7, va="center")
-    plt.text(lane_number, max(distances) + 20, label, ha="center", fontsize=8)
+def simulate_gel(lanes, labels, title, png_path=None):
+    # one raster image for all lanes (ladder first), shown with a single imshow
+    image = render_gel(lanes)
+    if png_path:
+        write_png(png_path, image)
+        print(f"Gel image written to {png_path}")
+    rows, sizes = ladder_ticks()
+    plt.figure(figsize=(max(4, len(lanes) + 3), 8))
+    plt.imshow(image, cmap="gray", aspect="auto")
+    plt.yticks(rows, sizes, fontsize=7)
+    plt.xticks(lane_centers(len(lanes) + 1), ["Ladder"] + labels, fontsize=8)
+    plt.title(title)
+    plt.tight_layout()
+    plt.show()
 
 def main():
     root = tk.Tk()
@@ -33,48 +38,66 @@ def main():
 
     num_genomes = 10
     all_fragment_data = []
+    first_path = None
 
     print(f"Select {num_genomes} FASTA files (one by one):")
     for i in range(num_genomes):
         filepath = filedialog.askopenfilename(
             title=f"Select genome {i+1}",
-            filetypes=(("FASTA files", "*.fasta"), ("All files", "*.*"))
+            filetypes=(("FASTA files", "*.fasta *.gz"), ("All files", "*.*"))
         )
         if not filepath:
             print("File selection cancelled.")
             return
 
-        seq = read_fasta(filepath)
-        fragments = digest_sequence(seq)
+        first_path = first_path or filepath
+
+        # EcoRI sites are saved next to the FASTA (<file>.sites.npz), so a rerun only reads them back
+        sites = genome_site_index(filepath, ECO_RI)
+        fragments = []
+        for record in range(len(sites.names)):
+            # cuts at G^AATTC, so the site bases stay on the fragments
+            fragments.extend(sites.digest("EcoRI", record).tolist())
         all_fragment_data.append((filepath.split("/")[-1], fragments))
 
     most_fragments = max(all_fragment_data, key=lambda x: len(x[1]))
     print("\nGenome with most EcoRI fragments:")
     print(f"→ {most_fragments[0]} ({len(most_fragments[1])} fragments)\n")
 
-    plt.figure(figsize=(10, 8))
-    plt.title("EcoRI Restriction Digest – All Genomes")
-    plt.xlabel("Genome Lane")
-    plt.ylabel("Migration Distance (a.u.)")
+    simulate_gel([fragments for _, fragments in all_fragment_data],
+                 [f"G{lane}" for lane in range(1, len(all_fragment_data) + 1)],
+                 "EcoRI Restriction Digest – All Genomes",
+                 os.path.join(os.path.dirname(os.path.abspath(first_path)), "ecori_gel_all.png"))
 
     for lane, (name, fragments) in enumerate(all_fragment_data, start=1):
-        simulate_gel(fragments, lane, f"G{lane}")
+        simulate_gel([fragments], [f"G{lane}"], f"EcoRI Digest – Genome {lane}\n{name}")
 
-    plt.gca().invert_yaxis()
-    plt.xlim(0, num_genomes + 1)
-    plt.tight_layout()
-    plt.show()
+def batch_main(argv):
+    # headless survey: python Ex2.py --batch <folder or FASTA> [out.csv] [--enzymes EcoRI,BamHI]
+    parser = argparse.ArgumentParser(prog="Ex2.py --batch")
+    parser.add_argument("input", help="folder of FASTA files or a multi-FASTA file")
+    parser.add_argument("output", nargs="?", default="digest_summary.csv")
+    parser.add_argument("--enzymes", default="EcoRI", help="comma-separated enzyme names")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args(argv)
 
-    for lane, (name, fragments) in enumerate(all_fragment_data, start=1):
-        plt.figure(figsize=(5, 7))
-        plt.title(f"EcoRI Digest – Genome {lane}\n{name}")
-        plt.xlabel("Lane")
-        plt.ylabel("Migration Distance (a.u.)")
-        simulate_gel(fragments, 1, f"G{lane}")
-        plt.gca().invert_yaxis()
-        plt.xlim(0, 2)
-        plt.tight_layout()
-        plt.show()
+    names = [name.strip() for name in args.enzymes.split(",") if name.strip()]
+    unknown = [name for name in names if name not in ENZYMES]
+    if unknown:
+        parser.error(f"unknown enzymes: {', '.join(unknown)}")
+    panel = {name: ENZYMES[name] for name in names}
+
+    count = batch_digest(args.input, args.output, panel, args.processes)
+    print(f"Digested {count} records with {', '.join(names)} -> {args.output}")
+
+    with open(args.output, newline="") as f:
+        rows = list(csv.DictReader(f))
+    if rows:
+        most = max(rows, key=lambda row: int(row["fragments"]))
+        print(f"Most fragments: {most['file']} {most['record']} ({most['fragments']} fragments)")
 
 if __name__ == "__main__":
-    main()
+    if "--batch" in sys.argv[1:]:
+        batch_main([a for a in sys.argv[1:] if a != "--batch"])
+    else:
+        main()
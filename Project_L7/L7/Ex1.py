@@ -1,37 +1,24 @@
 import os
-from collections import Counter
+import sys
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from bioinf.cache import cached_records, cached_sequence
+from bioinf.repeats import repeat_counts
+from bioinf.tandem import tandem_repeats
 
-def read_fasta_file(path):
-    seq = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            if not line.startswith(">"):
-                seq.append(line.strip().upper())
-    return "".join(seq)
 
-def sanitize(seq):
-    return "".join(ch for ch in seq if ch in "ACGTN")
+def find_repeats(sequence, min_len=6, max_len=10, bloom_fp=None):
+    # Counter-like result (most_common, len) of the k-mers seen more than once;
+    # windows containing N or another ambiguity letter are skipped. bloom_fp=0.01
+    # keeps singletons out of memory on whole genomes.
+    return repeat_counts(sequence, min_len, max_len, bloom_fp=bloom_fp)
 
-def find_repeats(sequence, min_len=6, max_len=10):
-    seq = sanitize(sequence)
-    counts = Counter()
-    n = len(seq)
-
-    for L in range(min_len, max_len + 1):
-        if n < L:
-            continue
-        for i in range(n - L + 1):
-            kmer = seq[i:i+L]
-            if "N" in kmer:
-                continue
-            counts[kmer] += 1
-
-    repeats = Counter({k: v for k, v in counts.items() if v > 1})
-    return repeats
+def find_tandem_repeats(sequence, max_period=6, min_copies=3):
+    # microsatellites: copies of a 1-6 bp unit sitting next to each other
+    return list(tandem_repeats(sequence, max_period, min_copies))
 
 def plot_repeats(freqs, title, top=15, save_png=False, out_dir="plots"):
     if not freqs:
@@ -93,13 +80,13 @@ def plot_all_combined(all_freqs, file_names, top=10):
 def analyze_single_sequence():
     path = filedialog.askopenfilename(
         title="Select ONE FASTA (1000-3000 nt)",
-        filetypes=(("FASTA files", "*.fasta *.fa *.fna"), ("All files", "*.*"))
+        filetypes=(("FASTA files", "*.fasta *.fa *.fna *.gz"), ("All files", "*.*"))
     )
     if not path:
         print("No file selected.")
         return
 
-    seq = read_fasta_file(path)
+    seq = str(cached_sequence(path))
     length = len(seq)
     print(f"[INFO] Loaded {os.path.basename(path)} length={length} bp")
 
@@ -112,12 +99,15 @@ def analyze_single_sequence():
 
     reps = find_repeats(seq, 6, 10)
     print(f"[INFO] Found {len(reps)} repeated motifs (count > 1).")
+    for header, record in cached_records(path):
+        for tr in find_tandem_repeats(record):
+            print(f"    tandem ({tr['consensus']})x{tr['copies']} at {header.split()[0]}:{tr['start']}-{tr['end']}")
     plot_repeats(reps, title=os.path.basename(path), top=15, save_png=True)
 
 def analyze_multiple_influenza():
     paths = filedialog.askopenfilenames(
         title="Select influenza genome FASTA files",
-        filetypes=(("FASTA files", "*.fasta *.fa *.fna"), ("All files", "*.*"))
+        filetypes=(("FASTA files", "*.fasta *.fa *.fna *.gz"), ("All files", "*.*"))
     )
     if not paths:
         print("No files selected.")
@@ -130,7 +120,7 @@ def analyze_multiple_influenza():
     for idx, path in enumerate(paths, start=1):
         name = os.path.basename(path)
         try:
-            seq = read_fasta_file(path)
+            seq = str(cached_sequence(path))
             print(f"\n[{idx}/{len(paths)}] {name}: length={len(seq)} bp")
             reps = find_repeats(seq, 6, 10)
             print(f"    repeats found: {len(reps)} motifs with count > 1")
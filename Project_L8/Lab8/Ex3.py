@@ -2,45 +2,49 @@
 #try to find in these genoms possible transposons. for this one must detect possible inverted repeats without prior knowledge about their existance in the sequence.
 #the inverted repeat should have a min length of 4 letters and a max of 6 letters.
 
+import os
+import sys
 import tkinter as tk
+import numpy as np
 from tkinter import filedialog, messagebox
 
-def reverse_complement(seq):
-    comp = str.maketrans("ATGC", "TACG")
-    return seq.translate(comp)[::-1]
-
-def load_fasta(path):
-    seq = []
-    with open(path, "r") as f:
-        for line in f:
-            if not line.startswith(">"):
-                seq.append(line.strip().upper())
-    return "".join(seq)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from bioinf.cache import cached_records, cached_sequence
+from bioinf.packed import AMBIGUOUS, decode, encode
+from bioinf.suffix import find_repeats
 
 def find_inverted_repeats(genome, min_len=4, max_len=6):
+    codes = encode(genome)
     results = []
-    n = len(genome)
+    n = len(codes)
 
     for length in range(min_len, max_len + 1):
-        for i in range(n - 2 * length):
-            left = genome[i:i+length]
-            right = genome[i+length:i+2*length]
-
-            if left == reverse_complement(right):
-                results.append({
-                    "length": length,
-                    "repeat": left,
-                    "left_start": i,
-                    "left_end": i + length - 1,
-                    "right_start": i + length,
-                    "right_end": i + 2*length - 1
-                })
+        m = n - 2 * length
+        if m <= 0:
+            continue
+
+        # base j of the left arm must pair with base 2*length-1-j of the right arm
+        hit = np.ones(m, dtype=bool)
+        for j in range(length):
+            left = codes[j:j + m]
+            right = codes[2 * length - 1 - j:2 * length - 1 - j + m]
+            hit &= (left < AMBIGUOUS) & (left + right == 3)
+
+        for i in np.flatnonzero(hit).tolist():
+            results.append({
+                "length": length,
+                "repeat": decode(codes[i:i+length]),
+                "left_start": i,
+                "left_end": i + length - 1,
+                "right_start": i + length,
+                "right_end": i + 2*length - 1
+            })
     return results
 
 def open_file():
     filepath = filedialog.askopenfilename(
         title="Select Genome FASTA File",
-        filetypes=[("FASTA files", "*.fasta *.fa *.fna"), ("All files", "*.*")]
+        filetypes=[("FASTA files", "*.fasta *.fa *.fna *.gz"), ("All files", "*.*")]
     )
 
     if not filepath:
@@ -49,15 +53,20 @@ def open_file():
     messagebox.showinfo("Loading", f"Loading genome:\n{filepath}")
 
     try:
-        genome = load_fasta(filepath)
+        records = cached_records(filepath)
     except Exception as e:
         messagebox.showerror("Error", f"Could not read file:\n{e}")
         return
 
-    print("Genome loaded. Length:", len(genome), "bp")
+    print("Genome loaded. Length:", sum(len(seq) for _, seq in records), "bp")
     print("Detecting inverted repeats (4–6 bp)...")
 
-    hits = find_inverted_repeats(genome)
+    # record by record, so no repeat pairs bases of two different records
+    hits = []
+    for header, seq in records:
+        for h in find_inverted_repeats(seq):
+            h["record"] = header.split()[0] if header else ""
+            hits.append(h)
 
     print("Found:", len(hits), "inverted repeats")
 
@@ -65,6 +74,7 @@ def open_file():
     with open(out_file, "w") as f:
         for h in hits:
             f.write(
+                (f"{h['record']}\t" if len(records) > 1 else "") +
                 f"{h['length']}\t{h['repeat']}\t"
                 f"{h['left_start']}\t{h['left_end']}\t"
                 f"{h['right_start']}\t{h['right_end']}\n"
@@ -76,9 +86,53 @@ def open_file():
         f"Results saved to:\n{out_file}"
     )
 
+def open_file_long_repeats(min_len=200):
+    # transposon-sized repeats of any length (direct and inverted) from the suffix array
+    filepath = filedialog.askopenfilename(
+        title="Select Genome FASTA File",
+        filetypes=[("FASTA files", "*.fasta *.fa *.fna *.gz"), ("All files", "*.*")]
+    )
+
+    if not filepath:
+        return
+
+    try:
+        records = cached_records(filepath)
+        genome = cached_sequence(filepath)
+    except Exception as e:
+        messagebox.showerror("Error", f"Could not read file:\n{e}")
+        return
+
+    print("Genome loaded. Length:", sum(len(seq) for _, seq in records), "bp")
+    print(f"Detecting maximal repeats (>= {min_len} bp)...")
+
+    # records are joined with an N (which matches nothing), so repeats shared by a
+    # chromosome and a plasmid are still found; positions go back to record:offset
+    repeats = find_repeats(genome, min_len)
+    names = [header.split()[0] if header else "" for header, _ in records]
+    offsets = np.cumsum([0] + [len(seq) + 1 for _, seq in records])
+
+    def locate(start):
+        i = np.searchsorted(offsets, start, side="right") - 1
+        return f"{names[i]}:{start - offsets[i]}" if len(records) > 1 else str(start)
+
+    print("Found:", len(repeats), "maximal repeats")
+
+    out_file = filepath + "_long_repeats.txt"
+    with open(out_file, "w") as f:
+        for r in repeats:
+            copies = " ".join(f"{locate(start)}{strand}" for start, strand in r["positions"])
+            f.write(f"{r['length']}\t{r['copies']}\t{copies}\n")
+
+    messagebox.showinfo(
+        "Done",
+        f"Found {len(repeats)} maximal repeats (>= {min_len} bp).\n\n"
+        f"Results saved to:\n{out_file}"
+    )
+
 root = tk.Tk()
 root.title("Transposon Finder – Inverted Repeat Detector")
-root.geometry("400x200")
+root.geometry("400x250")
 
 label = tk.Label(root, text="Select a bacterial genome FASTA file", font=("Arial", 12))
 label.pack(pady=20)
@@ -86,4 +140,7 @@ label.pack(pady=20)
 btn = tk.Button(root, text="Choose File", command=open_file, font=("Arial", 12))
 btn.pack(pady=20)
 
+btn_long = tk.Button(root, text="Find Long Repeats", command=open_file_long_repeats, font=("Arial", 12))
+btn_long.pack(pady=5)
+
 root.mainloop()
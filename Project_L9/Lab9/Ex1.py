@@ -1,3 +1,10 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from bioinf.gel import FINE_MODEL, LADDER_100BP, migration, render_gel, write_png
+from bioinf.site_index import SiteIndex
+
 enzymes = {
     "EcoRI":   {"seq": "GAATTC", "cut_pos": 1},
     "BamHI":   {"seq": "GGATCC", "cut_pos": 1},
@@ -17,17 +24,6 @@ dna = (
     "GGCGCAACCGATTAGGACCATGTAGAACATTACTTATAAGTCATCTTTTAAACACAATCTTCCTGCTCAGTGGTACATGGTTTTCGCTATTGCTAGCCAGCCTCATAAGTAACACCACTACTGCGAC"
 )  
 
-def find_cleavages(seq, recog, cut_pos):
-    positions = []
-    start = 0
-    while True:
-        idx = seq.find(recog, start)
-        if idx == -1:
-            break
-        positions.append(idx + cut_pos)
-        start = idx + 1
-    return positions
-
 def fragment_lengths(seq, cleavage_sites):
     if not cleavage_sites:
         return [len(seq)]
@@ -44,31 +40,33 @@ def fragment_lengths(seq, cleavage_sites):
     return fragments
 
 
-def gel_simulation(all_fragments):
+def gel_simulation(lanes, png_path):
+    # one lane per enzyme next to a 100 bp ladder, written as a PNG (no display needed)
     print("\n===== ELECTROPHORESIS GEL (SIMULATION) =====\n")
     print("Large fragments = top, Small fragments = bottom\n")
 
-    max_len = max(all_fragments)
-    scale = 50 / max_len
+    image = render_gel(list(lanes.values()), ladder=LADDER_100BP, model=FINE_MODEL)
+    write_png(png_path, image)
 
-    sorted_frags = sorted(all_fragments, reverse=True)
+    for name, frags in lanes.items():
+        sizes = sorted(frags, reverse=True)
+        distances = migration(sizes, FINE_MODEL)
+        bands = ", ".join(f"{f} bp @ {d:.2f}" for f, d in zip(sizes, distances))
+        print(f"{name:14s} {bands}")
+    print(f"\nGel image (ladder + {len(lanes)} lanes) written to {png_path}")
 
-    for f in sorted_frags:
-        line = "|" + "#" * int(f * scale)
-        print(f"{f:5d} bp  {line}")
 
-
-all_fragments_for_gel = []
+fragments_per_enzyme = {}
+sites = SiteIndex.build(dna, enzymes)
 
 for name, data in enzymes.items():
     recog = data["seq"]
-    cut_pos = data["cut_pos"]
 
     print("\n========================================")
     print(f"Enzyme: {name}")
     print("Recognition site:", recog)
 
-    cuts = find_cleavages(dna, recog, cut_pos)
+    cuts = sites.cuts(name).tolist()
     print("Cleavage positions:", cuts)
     print("Number of cleavages:", len(cuts))
 
@@ -76,7 +74,15 @@ for name, data in enzymes.items():
     print("Fragments:", frags)
     print("Total fragments:", len(frags))
 
-    all_fragments_for_gel.extend(frags)
+    fragments_per_enzyme[name] = frags
+
+# double digest straight from the site index, without scanning the DNA again
+double = ["BamHI", "HindIII"]
+print("\n========================================")
+print("Double digest:", " + ".join(double))
+print("Cleavage positions:", sites.cuts(double).tolist())
+print("Fragments:", sites.digest(double).tolist())
+fragments_per_enzyme["+".join(double)] = sites.digest(double).tolist()
 
-gel_simulation(all_fragments_for_gel)
+gel_simulation(fragments_per_enzyme, os.path.join(os.path.dirname(os.path.abspath(__file__)), "gel.png"))
 
@@ -0,0 +1,251 @@
+# De Bruijn graph assembly from reads with unknown positions.
+# Reads are joined with N separators and cut into canonical 2-bit k-mers batch by
+# batch; the solid k-mers (count >= min_count) form the graph. Nodes are the sorted
+# k-mers of both orientations, edges are found with searchsorted, and unitigs are
+# laid out by pointer jumping over the unique-successor links instead of walking
+# the graph one k-mer at a time. Before the contigs are read out, short dead-end
+# tips and short low-coverage unitigs (the two sides of an error bubble) are
+# removed and the unitigs are rebuilt, a few rounds at most.
+
+import numpy as np
+
+from bioinf.kmers import MAX_K, canonical_kmer_codes, decode_kmer, revcomp_kmers
+from bioinf.packed import AMBIGUOUS, LETTERS, encode
+
+BATCH_BASES = 1 << 24
+TIP_FACTOR = 2
+BUBBLE_FACTOR = 4
+LOW_COVERAGE = 0.25
+CLEAN_ROUNDS = 4
+
+
+def join_reads(reads):
+    # one code array with an ambiguous base between reads, so no k-mer spans two reads
+    if reads and isinstance(reads[0], str):
+        return encode("N".join(reads) + "N")
+    parts = []
+    for read in reads:
+        parts.append(encode(read))
+        parts.append(np.array([AMBIGUOUS], dtype=np.uint8))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+
+
+def merge_counts(kmers, counts):
+    kmers, inverse = np.unique(np.concatenate(kmers), return_inverse=True)
+    return kmers, np.bincount(inverse.ravel(), weights=np.concatenate(counts)).astype(np.int64)
+
+
+def batch_kmer_counts(reads, k):
+    codes, valid = canonical_kmer_codes(join_reads(reads), k)
+    return np.unique(codes[valid], return_counts=True)
+
+
+def read_batches(reads, batch_bases):
+    batch, size = [], 0
+    for read in reads:
+        batch.append(read)
+        size += len(read)
+        if size >= batch_bases:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def count_read_kmers(reads, k, batch_bases=BATCH_BASES):
+    # sorted distinct canonical k-mers and their counts over all reads; partial
+    # counts are merged every few batches to bound memory
+    kmers, counts = [np.zeros(0, dtype=np.uint64)], [np.zeros(0, dtype=np.int64)]
+    for batch in read_batches(reads, batch_bases):
+        found, n = batch_kmer_counts(batch, k)
+        kmers.append(found)
+        counts.append(n)
+        if len(kmers) > 8:
+            merged = merge_counts(kmers, counts)
+            kmers, counts = [merged[0]], [merged[1]]
+    return merge_counts(kmers, counts)
+
+
+def neighbours(nodes, shifted, size=None):
+    # for each queried node: number of the 4 candidate k-mers present, and the index
+    # of the last one found
+    size = len(nodes) if size is None else size
+    degree = np.zeros(size, dtype=np.int8)
+    found = np.full(size, -1, dtype=np.int64)
+    for base in range(4):
+        candidate = shifted(np.uint64(base))
+        idx = np.searchsorted(nodes, candidate)
+        hit = idx < len(nodes)
+        hit[hit] = nodes[idx[hit]] == candidate[hit]
+        degree += hit
+        found[hit] = idx[hit]
+    return degree, found
+
+
+def extend_right(codes, k):
+    mask = np.uint64((1 << 2 * k) - 1) if k < 32 else np.uint64(0xFFFFFFFFFFFFFFFF)
+    return lambda b: ((codes << np.uint64(2)) & mask) | b
+
+
+def extend_left(codes, k):
+    high = np.uint64(2 * (k - 1))
+    return lambda b: (codes >> np.uint64(2)) | (b << high)
+
+
+def unitig_links(nodes, k):
+    # nxt[i] = j when i has exactly one successor j and j has exactly one predecessor
+    out_degree, successor = neighbours(nodes, extend_right(nodes, k))
+    in_degree, _ = neighbours(nodes, extend_left(nodes, k))
+
+    nxt = np.full(len(nodes), -1, dtype=np.int64)
+    linked = out_degree == 1
+    linked[linked] = in_degree[successor[linked]] == 1
+    nxt[linked] = successor[linked]
+    return nxt
+
+
+def jump_to_head(prv, key=None, rounds=64):
+    # pointer jumping along prv: chain head and distance to it, plus (optionally) the
+    # minimum key seen on the way; nodes whose pointer never clears sit on cycles
+    jump = prv.copy()
+    rank = (prv >= 0).astype(np.int64)
+    head = np.arange(len(prv), dtype=np.int64)
+    low = None if key is None else key.copy()
+    for _ in range(rounds):
+        active = np.flatnonzero(jump >= 0)
+        if not len(active):
+            break
+        target = jump[active]
+        rank[active] += rank[target]
+        head[active] = head[target]
+        if low is not None:
+            low[active] = np.minimum(low[active], low[target])
+        jump[active] = jump[target]
+    return rank, head, low, jump >= 0
+
+
+def unitigs(kmers, k):
+    # graph nodes plus, per node, its unitig head and position; one head per unitig pair
+    n = len(kmers)
+    nodes = np.concatenate((kmers, revcomp_kmers(kmers, k)))
+    order = np.argsort(nodes, kind="stable")
+    nodes = nodes[order]
+    canonical_id = order % n
+    reverse = order >= n
+
+    nxt = unitig_links(nodes, k)
+    prv = np.full(len(nodes), -1, dtype=np.int64)
+    linked = np.flatnonzero(nxt >= 0)
+    prv[nxt[linked]] = linked
+
+    rounds = int(np.ceil(np.log2(max(len(nodes), 2)))) + 1
+    rank, head, _, cyclic = jump_to_head(prv, rounds=rounds)
+
+    # break every cycle at its node with the smallest (canonical id, strand); only
+    # the cyclic nodes are ranked again
+    if cyclic.any():
+        ring = np.flatnonzero(cyclic)
+        local = np.full(len(nodes), -1, dtype=np.int64)
+        local[ring] = np.arange(len(ring))
+        ring_prv = local[prv[ring]]
+        key = canonical_id[ring] * 2 + reverse[ring]
+        _, _, low, _ = jump_to_head(ring_prv, key, rounds)
+        cut = ring[low == key]
+        nxt[prv[cut]] = -1
+        prv[cut] = -1
+        ring_prv[local[cut]] = -1
+        ring_rank, ring_head, _, _ = jump_to_head(ring_prv, rounds=rounds)
+        rank[ring] = ring_rank
+        head[ring] = ring[ring_head]
+
+    # each unitig is found once per strand: keep the copy whose first k-mer is not
+    # larger than the reverse complement of its last one (forward cut node for cycles)
+    heads = np.flatnonzero(prv < 0)
+    ends = np.flatnonzero(nxt < 0)
+    tails = np.empty(len(heads), dtype=np.int64)
+    tails[np.searchsorted(heads, head[ends])] = ends
+    keep = np.where(cyclic[heads], ~reverse[heads],
+                    nodes[heads] <= revcomp_kmers(nodes[tails], k))
+    return nodes, head, rank, heads[keep], canonical_id
+
+
+def unitig_layout(nodes, head, rank, heads):
+    # node indices in unitig order, where each kept unitig starts and how many k-mers it has
+    order = np.lexsort((rank, head))
+    starts = np.searchsorted(head[order], heads)
+    lengths = np.bincount(head, minlength=len(nodes))[heads]
+    return order, starts, lengths
+
+
+def clean_graph(kmers, counts, k, tip_factor=TIP_FACTOR, bubble_factor=BUBBLE_FACTOR,
+                low_coverage=LOW_COVERAGE, rounds=CLEAN_ROUNDS):
+    # drop unitigs shorter than tip_factor * k bases that dead-end on one side (tips),
+    # and unitigs shorter than bubble_factor * k bases whose coverage is below
+    # low_coverage * the median k-mer count (the error side of a bubble)
+    for _ in range(rounds):
+        if not len(kmers):
+            break
+        nodes, head, rank, heads, canonical_id = unitigs(kmers, k)
+        order, starts, lengths = unitig_layout(nodes, head, rank, heads)
+        tails = order[starts + lengths - 1]
+        in_degree, _ = neighbours(nodes, extend_left(nodes[heads], k), len(heads))
+        out_degree, _ = neighbours(nodes, extend_right(nodes[tails], k), len(heads))
+        coverage = np.bincount(head, weights=counts[canonical_id], minlength=len(nodes))[heads] / lengths
+
+        bases = lengths + k - 1
+        tip = (bases < tip_factor * k) & ((in_degree == 0) | (out_degree == 0))
+        weak = (bases < bubble_factor * k) & (coverage < low_coverage * np.median(counts))
+        remove = tip | weak
+        if not remove.any():
+            break
+        keep = np.ones(len(kmers), dtype=bool)
+        keep[canonical_id[np.isin(head, heads[remove])]] = False
+        kmers, counts = kmers[keep], counts[keep]
+    return kmers, counts
+
+
+def assemble(reads, k=31, min_count=2, min_length=0, clean=True):
+    # contigs (longest first) with their mean k-mer coverage; clean=False keeps the
+    # tips and bubbles that sequencing errors leave in the graph
+    if not 1 <= k <= MAX_K or k % 2 == 0:
+        raise ValueError(f"k must be odd and at most {MAX_K}")
+    kmers, counts = count_read_kmers(reads, k)
+    solid = counts >= min_count
+    kmers, counts = kmers[solid], counts[solid]
+    if clean:
+        kmers, counts = clean_graph(kmers, counts, k)
+    if not len(kmers):
+        return []
+
+    nodes, head, rank, heads, canonical_id = unitigs(kmers, k)
+    order, starts, lengths = unitig_layout(nodes, head, rank, heads)
+    last_bases = LETTERS[(nodes[order] & np.uint64(3)).astype(np.uint8)]
+
+    contigs = []
+    for first, start, length in zip(heads, starts, lengths):
+        if length + k - 1 < min_length:
+            continue
+        members = order[start:start + length]
+        seq = decode_kmer(nodes[first], k) + last_bases[start + 1:start + length].tobytes().decode("ascii")
+        coverage = float(counts[canonical_id[members]].mean())
+        contigs.append((seq, coverage))
+    contigs.sort(key=lambda c: -len(c[0]))
+    return contigs
+
+
+def n50(lengths):
+    lengths = np.sort(np.asarray(lengths, dtype=np.int64))[::-1]
+    if not len(lengths):
+        return 0
+    half = lengths.sum() / 2
+    return int(lengths[np.searchsorted(np.cumsum(lengths), half)])
+
+
+def assembly_stats(contigs):
+    lengths = [len(c[0]) if isinstance(c, tuple) else len(c) for c in contigs]
+    return {
+        "contigs": len(lengths),
+        "total_length": int(sum(lengths)),
+        "longest": max(lengths, default=0),
+        "n50": n50(lengths),
+    }
@@ -0,0 +1,195 @@
+# gzip / BGZF support for the FASTA layer.
+# BGZF (the bgzip format used by samtools) is a series of independent gzip members
+# of at most 64 KB each, so blocks can be inflated in parallel and a single block
+# can be located and inflated on its own for random access. Block positions are
+# kept in a samtools-compatible .gzi sidecar.
+
+import io
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+GZIP_MAGIC = b"\x1f\x8b"
+BLOCK_DATA = 0xff00
+EOF_BLOCK = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def is_gzip(path):
+    with open(path, "rb") as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def is_bgzf(path):
+    with open(path, "rb") as f:
+        head = f.read(18)
+    return (len(head) == 18 and head[:2] == GZIP_MAGIC and head[3] & 4
+            and head[12:14] == b"BC")
+
+
+def block_size(data, offset):
+    xlen = struct.unpack_from("<H", data, offset + 10)[0]
+    pos = offset + 12
+    while pos < offset + 12 + xlen:
+        si, slen = data[pos:pos + 2], struct.unpack_from("<H", data, pos + 2)[0]
+        if si == b"BC":
+            return struct.unpack_from("<H", data, pos + 4)[0] + 1, 12 + xlen
+        pos += 4 + slen
+    raise ValueError("not a BGZF block (missing BC extra field)")
+
+
+def scan_blocks(data):
+    # (compressed offset, compressed size, header size, uncompressed offset) per block
+    blocks = []
+    coffset = uoffset = 0
+    while coffset < len(data):
+        size, header = block_size(data, coffset)
+        isize = struct.unpack_from("<I", data, coffset + size - 4)[0]
+        if isize:
+            blocks.append((coffset, size, header, uoffset))
+        coffset += size
+        uoffset += isize
+    return blocks, uoffset
+
+
+def inflate(data, block):
+    coffset, size, header, _ = block
+    return zlib.decompress(data[coffset + header:coffset + size - 8], -15)
+
+
+def map_file(path):
+    f = open(path, "rb")
+    if not os.path.getsize(path):
+        return f, b""
+    return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_bgzf_blocks(path, threads=None, batch=64):
+    f, data = map_file(path)
+    try:
+        blocks, _ = scan_blocks(data)
+        # zlib releases the GIL, so a thread pool inflates blocks truly in parallel
+        with ThreadPoolExecutor(threads) as pool:
+            for i in range(0, len(blocks), batch):
+                yield from pool.map(lambda b: inflate(data, b), blocks[i:i + batch])
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+        f.close()
+
+
+class BlockStream(io.RawIOBase):
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, out):
+        while not self.buffer:
+            self.buffer = next(self.blocks, None)
+            if self.buffer is None:
+                self.buffer = b""
+                return 0
+        n = min(len(out), len(self.buffer))
+        out[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+def open_bgzf(path, threads=None):
+    return io.BufferedReader(BlockStream(read_bgzf_blocks(path, threads)), 1 << 20)
+
+
+def gzi_path(path):
+    return path + ".gzi"
+
+
+def write_gzi(path, blocks):
+    # samtools layout: entry count, then (compressed, uncompressed) offsets of every
+    # block after the first one
+    pairs = np.array([(b[0], b[3]) for b in blocks[1:]], dtype="<u8").reshape(-1, 2)
+    with open(gzi_path(path), "wb") as out:
+        out.write(struct.pack("<Q", len(pairs)))
+        out.write(pairs.tobytes())
+
+
+def read_gzi(path):
+    with open(gzi_path(path), "rb") as f:
+        count = struct.unpack("<Q", f.read(8))[0]
+        pairs = np.frombuffer(f.read(16 * count), dtype="<u8").reshape(-1, 2)
+    return [(0, 0)] + [(int(c), int(u)) for c, u in pairs]
+
+
+class BgzfReader:
+
+    def __init__(self, path):
+        self.file, self.data = map_file(path)
+        index = gzi_path(path)
+        if os.path.exists(index) and os.path.getmtime(index) >= os.path.getmtime(path):
+            offsets = read_gzi(path)
+            self.coffsets = [c for c, _ in offsets]
+            self.uoffsets = [u for _, u in offsets]
+        else:
+            blocks, _ = scan_blocks(self.data)
+            write_gzi(path, blocks)
+            self.coffsets = [b[0] for b in blocks] or [0]
+            self.uoffsets = [b[3] for b in blocks] or [0]
+        self.cache = {}
+
+    def block(self, i):
+        if i not in self.cache:
+            if len(self.cache) > 64:
+                self.cache.clear()
+            coffset = self.coffsets[i]
+            if coffset >= len(self.data):
+                return b""
+            size, header = block_size(self.data, coffset)
+            self.cache[i] = inflate(self.data, (coffset, size, header, 0))
+        return self.cache[i]
+
+    def read(self, start, end):
+        parts = []
+        i = bisect_right(self.uoffsets, start) - 1
+        while start < end and i < len(self.uoffsets):
+            chunk = self.block(i)
+            if not chunk:
+                break
+            local = start - self.uoffsets[i]
+            piece = chunk[local:local + end - start]
+            parts.append(piece)
+            start += len(piece)
+            i += 1
+        return b"".join(parts)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+
+def compress_block(data):
+    deflate = zlib.compressobj(6, zlib.DEFLATED, -15)
+    payload = deflate.compress(data) + deflate.flush()
+    header = struct.pack("<4BI2BH2BHH", 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6,
+                         ord("B"), ord("C"), 2, len(payload) + 25)
+    return header + payload + struct.pack("<II", zlib.crc32(data), len(data))
+
+
+def bgzip(src, dst=None, threads=None):
+    dst = dst or src + ".gz"
+    with open(src, "rb") as f, open(dst, "wb") as out, ThreadPoolExecutor(threads) as pool:
+        while True:
+            chunks = [c for c in (f.read(BLOCK_DATA) for _ in range(64)) if c]
+            if not chunks:
+                break
+            for block in pool.map(compress_block, chunks):
+                out.write(block)
+        out.write(EOF_BLOCK)
+    return dst
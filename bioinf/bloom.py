@@ -0,0 +1,50 @@
+# Bloom filter over 64-bit integer keys (packed k-mer codes).
+# Sized from the expected number of keys and the false-positive rate. Each key sets
+# all its bits inside one 64-bit word (a "blocked" filter), so adding or testing a
+# whole array of keys is one hash, one gather and one bitwise_or.at. The filter can
+# say "seen" for a key it has never been given, but never the other way round; the
+# one-word layout lands near fp_rate down to about 1%, and above it for smaller rates.
+
+import numpy as np
+
+MAX_HASHES = 10
+
+
+def splitmix64(x):
+    x = np.asarray(x, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, fp_rate=0.01):
+        if not 0 < fp_rate < 1:
+            raise ValueError("fp_rate must be between 0 and 1")
+        # bits per key as for a classic filter, plus a quarter for the one-word layout
+        bits = -max(capacity, 1) * np.log(fp_rate) / np.log(2) ** 2 * 1.25
+        self.words = np.zeros(max(int(np.ceil(bits / 64)), 1), dtype=np.uint64)
+        self.hashes = int(min(max(round(bits / max(capacity, 1) * np.log(2)), 1), MAX_HASHES))
+
+    @property
+    def nbytes(self):
+        return self.words.nbytes
+
+    def locate(self, keys):
+        # word index and bit mask of every key
+        h = splitmix64(keys)
+        word = (h % np.uint64(len(self.words))).astype(np.int64)
+        h2 = splitmix64(h)
+        mask = np.zeros(len(h), dtype=np.uint64)
+        for i in range(self.hashes):
+            mask |= np.uint64(1) << ((h2 >> np.uint64(6 * i)) & np.uint64(63))
+        return word, mask
+
+    def add(self, keys):
+        word, mask = self.locate(keys)
+        np.bitwise_or.at(self.words, word, mask)
+
+    def contains(self, keys):
+        word, mask = self.locate(keys)
+        return (self.words[word] & mask) == mask
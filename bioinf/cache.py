@@ -0,0 +1,95 @@
+# On-disk cache of parsed genomes.
+# The first time a FASTA file is read its records are stored 2-bit packed in .npy
+# files under a directory named after the SHA-1 of the file contents, so editing
+# the file simply produces a new key. Later runs memory-map those arrays instead
+# of parsing the text again.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from bioinf.packed import AMBIGUOUS, PackedSequence, read_packed_records
+
+CACHE_DIR = os.environ.get("BIOINF_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "bioinf"))
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_entry(path, folder):
+    packed, starts, ends, records = [], [], [], []
+    packed_offset = mask_offset = 0
+
+    for header, seq in read_packed_records(path):
+        records.append({
+            "header": header,
+            "length": seq.length,
+            "packed_offset": packed_offset,
+            "mask_offset": mask_offset,
+            "mask_count": len(seq.mask_starts),
+            "mask_letters": seq.mask_letters.decode("latin-1"),
+        })
+        packed.append(seq.packed)
+        starts.append(seq.mask_starts)
+        ends.append(seq.mask_ends)
+        packed_offset += len(seq.packed)
+        mask_offset += len(seq.mask_starts)
+
+    # write into a temporary folder first so an interrupted run never leaves half an entry
+    os.makedirs(os.path.dirname(folder), exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(folder))
+    try:
+        np.save(os.path.join(tmp, "packed.npy"), np.concatenate(packed or [np.zeros(0, np.uint8)]))
+        np.save(os.path.join(tmp, "mask_starts.npy"), np.concatenate(starts or [np.zeros(0, np.int64)]))
+        np.save(os.path.join(tmp, "mask_ends.npy"), np.concatenate(ends or [np.zeros(0, np.int64)]))
+        with open(os.path.join(tmp, "records.json"), "w") as f:
+            json.dump({"source": os.path.abspath(path), "records": records}, f)
+        os.replace(tmp, folder)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.exists(os.path.join(folder, "records.json")):
+            raise
+
+
+def cached_records(path, cache_dir=None):
+    folder = os.path.join(cache_dir or CACHE_DIR, file_digest(path))
+    if not os.path.exists(os.path.join(folder, "records.json")):
+        write_entry(path, folder)
+
+    with open(os.path.join(folder, "records.json")) as f:
+        records = json.load(f)["records"]
+    packed = np.load(os.path.join(folder, "packed.npy"), mmap_mode="r")
+    starts = np.load(os.path.join(folder, "mask_starts.npy"), mmap_mode="r")
+    ends = np.load(os.path.join(folder, "mask_ends.npy"), mmap_mode="r")
+
+    result = []
+    for r in records:
+        p, m = r["packed_offset"], r["mask_offset"]
+        seq = PackedSequence(packed[p:p + (r["length"] + 3) // 4], r["length"],
+                             starts[m:m + r["mask_count"]], ends[m:m + r["mask_count"]],
+                             r["mask_letters"].encode("latin-1"))
+        result.append((r["header"], seq))
+    return result
+
+
+def cached_sequence(path, cache_dir=None):
+    # one sequence for the whole file: a single record straight from the cache, or all
+    # records joined with an N between them, so no k-mer, window or site spans two
+    # records (labs that report positions should loop over cached_records instead)
+    records = cached_records(path, cache_dir)
+    if len(records) == 1:
+        return records[0][1]
+    parts = []
+    for _, seq in records:
+        parts.append(seq.codes())
+        parts.append(np.array([AMBIGUOUS], dtype=np.uint8))
+    return PackedSequence.from_codes(np.concatenate(parts[:-1]) if parts else np.zeros(0, dtype=np.uint8))
@@ -0,0 +1,121 @@
+# Codon usage, RSCU and CAI from integer codon codes.
+# Codons are counted with one bincount over codon indices (see translate.py), either
+# in frame 0 of the whole sequence or only inside called ORFs, and a folder of
+# genomes is turned into one genomes x 64 codon-usage matrix on a process pool.
+
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bioinf.fasta import fasta_files, read_fasta_records
+from bioinf.orfs import find_orfs
+from bioinf.packed import encode
+from bioinf.translate import THREE_LETTER, codon_indices, codon_name, codon_table, revcomp_codes
+
+CODONS = [codon_name(i) for i in range(64)]
+
+
+def codon_counts(seq, orfs=None):
+    # 64 codon counts; frame 0 of the sequence, or the coding strand of each ORF
+    codes = encode(seq)
+    if orfs is None:
+        return np.bincount(codon_indices(codes, 0), minlength=65)[:64]
+
+    counts = np.zeros(65, dtype=np.int64)
+    for orf in orfs:
+        region = codes[orf["start"]:orf["end"]]
+        if orf["strand"] == "-":
+            region = revcomp_codes(region)
+        counts += np.bincount(codon_indices(region, 0), minlength=65)
+    return counts[:64]
+
+
+def amino_acids(table=1):
+    return np.array([chr(c) for c in codon_table(table)[:64]])
+
+
+def amino_acid_counts(counts, table=1, three_letter=True):
+    totals = {}
+    for aa, count in zip(amino_acids(table), counts):
+        if aa == "*" or not count:
+            continue
+        name = THREE_LETTER[aa] if three_letter else aa
+        totals[name] = totals.get(name, 0) + int(count)
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def rscu(counts, table=1):
+    # observed count / count expected if all synonymous codons were used equally
+    counts = np.asarray(counts, dtype=float)
+    aa = amino_acids(table)
+    values = np.full(64, np.nan)
+    for letter in set(aa):
+        members = aa == letter
+        total = counts[members].sum()
+        if total:
+            values[members] = counts[members] * members.sum() / total
+    return values
+
+
+def relative_adaptiveness(reference_counts, table=1):
+    # w = count / count of the most used synonymous codon, from a reference set
+    counts = np.asarray(reference_counts, dtype=float)
+    aa = amino_acids(table)
+    weights = np.full(64, np.nan)
+    for letter in set(aa):
+        members = aa == letter
+        best = counts[members].max()
+        if best:
+            weights[members] = counts[members] / best
+    return weights
+
+
+def cai(counts, weights, table=1, floor=0.01):
+    # codon adaptation index (Sharp & Li): geometric mean of w over all codons, leaving
+    # out stops and amino acids with a single codon; unseen reference codons get floor
+    counts = np.asarray(counts, dtype=float)
+    aa = amino_acids(table)
+    single = np.array([(aa == a).sum() == 1 for a in aa])
+    use = (aa != "*") & ~single & ~np.isnan(weights)
+    total = counts[use].sum()
+    if not total:
+        return float("nan")
+    w = np.maximum(weights[use], floor)
+    return float(np.exp((counts[use] * np.log(w)).sum() / total))
+
+
+def genome_codon_counts(path, use_orfs=True, min_len=300, table=1):
+    counts = np.zeros(64, dtype=np.int64)
+    for _, seq in read_fasta_records(path):
+        codes = encode(seq)
+        orfs = find_orfs(codes, min_len, table) if use_orfs else None
+        counts += codon_counts(codes, orfs)
+    return counts
+
+
+def codon_usage_matrix(paths, use_orfs=True, min_len=300, table=1, processes=None):
+    # paths may be a folder; returns (genome names, genomes x 64 count matrix)
+    if isinstance(paths, str):
+        paths = fasta_files(paths)
+    paths = list(paths)
+    if not paths:
+        return [], np.zeros((0, 64), dtype=np.int64)
+
+    n = len(paths)
+    with ProcessPoolExecutor(processes) as pool:
+        rows = list(pool.map(genome_codon_counts, paths, [use_orfs] * n, [min_len] * n,
+                             [table] * n, chunksize=max(1, n // 32)))
+    names = [os.path.basename(p) for p in paths]
+    return names, np.vstack(rows)
+
+
+def write_codon_usage_csv(out_path, names, matrix, table=1):
+    with open(out_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["genome"] + CODONS + [f"RSCU_{c}" for c in CODONS])
+        for name, row in zip(names, matrix):
+            values = rscu(row, table)
+            writer.writerow([name] + [int(x) for x in row]
+                            + ["" if np.isnan(v) else f"{v:.4f}" for v in values])
@@ -0,0 +1,57 @@
+# Alphabet and composition counting in a single pass.
+# Every byte value is counted at once with np.bincount instead of one str.count
+# scan per letter, and files are processed piece by piece from the streaming reader,
+# so memory does not grow with the size of the FASTA file.
+
+import numpy as np
+
+from bioinf.fasta import CHUNK_SIZE, read_fasta_chunks
+
+
+def count_bytes(seq):
+    if isinstance(seq, str):
+        seq = seq.encode("latin-1", "replace")
+    return np.bincount(np.frombuffer(seq, dtype=np.uint8), minlength=256)
+
+
+def to_dict(counts):
+    return {chr(b): int(counts[b]) for b in np.flatnonzero(counts)}
+
+
+def symbol_counts(seq):
+    return to_dict(count_bytes(seq))
+
+
+def percentages(counts):
+    if not isinstance(counts, dict):
+        counts = to_dict(counts)
+    total = sum(counts.values())
+    if total == 0:
+        return {}
+    return {letter: nr / total * 100 for letter, nr in sorted(counts.items())}
+
+
+def record_compositions(path, chunk_size=CHUNK_SIZE):
+    # yields (header, 256-entry count array) for each record
+    current = None
+    header = ""
+    counts = None
+
+    for number, h, piece in read_fasta_chunks(path, chunk_size):
+        if number != current:
+            if current is not None:
+                yield header, counts
+            current, header, counts = number, h, np.zeros(256, dtype=np.int64)
+        counts += count_bytes(piece)
+
+    if current is not None:
+        yield header, counts
+
+
+def fasta_composition(path, chunk_size=CHUNK_SIZE):
+    records = []
+    total = np.zeros(256, dtype=np.int64)
+    for header, counts in record_compositions(path, chunk_size):
+        records.append((header, to_dict(counts)))
+        total += counts
+    return records, to_dict(total)
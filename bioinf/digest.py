@@ -0,0 +1,314 @@
+# Restriction digestion with a whole enzyme panel in one scan.
+# Enzymes use the Lab 9 format ({"seq": site, "cut_pos": offset of the top-strand cut},
+# plus an optional "cut_bottom", the bottom-strand cut in top-strand coordinates).
+# Sites may use IUPAC letters. The panel is compiled into one table indexed by the
+# 2-bit code of the next TABLE_K bases, holding a bitmask of the site patterns that
+# can start there; the genome is read once as k-mer codes, looked up in that table,
+# and only the few candidate hits of longer sites are checked base by base.
+
+import csv
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from bioinf.fasta import fasta_files, read_fasta_records
+from bioinf.kmers import kmer_codes
+from bioinf.packed import AMBIGUOUS, IUPAC_COMPLEMENT, encode
+
+TABLE_K = 10
+CHUNK_BASES = 1 << 22
+BATCH_BASES = 1 << 22
+SIZE_BINS = (0, 100, 250, 500, 1000, 2000, 5000, 10000, 20000, 50000)
+
+# bit b set when base code b is allowed
+IUPAC_MASKS = {
+    "A": 1, "C": 2, "G": 4, "T": 8, "U": 8,
+    "R": 5, "Y": 10, "S": 6, "W": 9, "K": 12, "M": 3,
+    "B": 14, "D": 13, "H": 11, "V": 7, "N": 15,
+}
+
+ENZYMES = {
+    "AatII":   {"seq": "GACGTC",   "cut_pos": 5},
+    "AccI":    {"seq": "GTMKAC",   "cut_pos": 2},
+    "AgeI":    {"seq": "ACCGGT",   "cut_pos": 1},
+    "AluI":    {"seq": "AGCT",     "cut_pos": 2},
+    "ApaI":    {"seq": "GGGCCC",   "cut_pos": 5},
+    "AscI":    {"seq": "GGCGCGCC", "cut_pos": 2},
+    "AvaI":    {"seq": "CYCGRG",   "cut_pos": 1},
+    "AvaII":   {"seq": "GGWCC",    "cut_pos": 1},
+    "BamHI":   {"seq": "GGATCC",   "cut_pos": 1},
+    "BanI":    {"seq": "GGYRCC",   "cut_pos": 1},
+    "BglII":   {"seq": "AGATCT",   "cut_pos": 1},
+    "BssHII":  {"seq": "GCGCGC",   "cut_pos": 1},
+    "BstNI":   {"seq": "CCWGG",    "cut_pos": 2},
+    "ClaI":    {"seq": "ATCGAT",   "cut_pos": 2},
+    "DdeI":    {"seq": "CTNAG",    "cut_pos": 1},
+    "DpnII":   {"seq": "GATC",     "cut_pos": 0},
+    "EagI":    {"seq": "CGGCCG",   "cut_pos": 1},
+    "EcoRI":   {"seq": "GAATTC",   "cut_pos": 1},
+    "EcoRV":   {"seq": "GATATC",   "cut_pos": 3},
+    "Fnu4HI":  {"seq": "GCNGC",    "cut_pos": 2},
+    "HaeII":   {"seq": "RGCGCY",   "cut_pos": 5},
+    "HaeIII":  {"seq": "GGCC",     "cut_pos": 2},
+    "HhaI":    {"seq": "GCGC",     "cut_pos": 3},
+    "HincII":  {"seq": "GTYRAC",   "cut_pos": 3},
+    "HindIII": {"seq": "AAGCTT",   "cut_pos": 1},
+    "HinfI":   {"seq": "GANTC",    "cut_pos": 1},
+    "HpaII":   {"seq": "CCGG",     "cut_pos": 1},
+    "KpnI":    {"seq": "GGTACC",   "cut_pos": 5},
+    "MluI":    {"seq": "ACGCGT",   "cut_pos": 1},
+    "MseI":    {"seq": "TTAA",     "cut_pos": 1},
+    "NcoI":    {"seq": "CCATGG",   "cut_pos": 1},
+    "NdeI":    {"seq": "CATATG",   "cut_pos": 2},
+    "NheI":    {"seq": "GCTAGC",   "cut_pos": 1},
+    "NlaIII":  {"seq": "CATG",     "cut_pos": 4},
+    "NotI":    {"seq": "GCGGCCGC", "cut_pos": 2},
+    "NsiI":    {"seq": "ATGCAT",   "cut_pos": 5},
+    "PacI":    {"seq": "TTAATTAA", "cut_pos": 5},
+    "PstI":    {"seq": "CTGCAG",   "cut_pos": 5},
+    "PvuI":    {"seq": "CGATCG",   "cut_pos": 4},
+    "PvuII":   {"seq": "CAGCTG",   "cut_pos": 3},
+    "RsaI":    {"seq": "GTAC",     "cut_pos": 2},
+    "SacI":    {"seq": "GAGCTC",   "cut_pos": 5},
+    "SalI":    {"seq": "GTCGAC",   "cut_pos": 1},
+    "Sau96I":  {"seq": "GGNCC",    "cut_pos": 1},
+    "ScaI":    {"seq": "AGTACT",   "cut_pos": 3},
+    "SfiI":    {"seq": "GGCCNNNNNGGCC", "cut_pos": 8},
+    "SmaI":    {"seq": "CCCGGG",   "cut_pos": 3},
+    "SpeI":    {"seq": "ACTAGT",   "cut_pos": 1},
+    "SphI":    {"seq": "GCATGC",   "cut_pos": 5},
+    "StuI":    {"seq": "AGGCCT",   "cut_pos": 3},
+    "StyI":    {"seq": "CCWWGG",   "cut_pos": 1},
+    "TaqI":    {"seq": "TCGA",     "cut_pos": 1},
+    "XbaI":    {"seq": "TCTAGA",   "cut_pos": 1},
+    "XhoI":    {"seq": "CTCGAG",   "cut_pos": 1},
+    "XmaI":    {"seq": "CCCGGG",   "cut_pos": 1},
+}
+
+
+def revcomp_site(site):
+    return site.encode("ascii").translate(IUPAC_COMPLEMENT)[::-1].decode("ascii")
+
+
+def site_patterns(enzymes):
+    # (enzyme name, site, top cut, bottom cut) for every strand a site must be searched on;
+    # palindromic sites match both strands at once and are searched once
+    patterns = []
+    for name, data in enzymes.items():
+        site = data["seq"].upper()
+        top = data["cut_pos"]
+        bottom = data.get("cut_bottom", len(site) - top)
+        patterns.append((name, site, top, bottom))
+        reverse = revcomp_site(site)
+        if reverse != site:
+            patterns.append((name, reverse, len(site) - bottom, len(site) - top))
+    return patterns
+
+
+def allowed_masks(site, width):
+    # (width,) IUPAC bitmasks, padded with N
+    masks = np.full(width, 15, dtype=np.uint8)
+    for j, letter in enumerate(site):
+        if letter not in IUPAC_MASKS:
+            raise ValueError(f"Unknown IUPAC letter {letter!r} in site {site}")
+        masks[j] = IUPAC_MASKS[letter]
+    return masks
+
+
+def expand_codes(masks):
+    # every concrete 2-bit code matching a row of IUPAC masks
+    codes = np.zeros(1, dtype=np.int64)
+    for mask in masks:
+        allowed = np.array([b for b in range(4) if mask >> b & 1], dtype=np.int64)
+        codes = (codes[:, None] * 4 + allowed).ravel()
+    return codes
+
+
+class EnzymePanel:
+
+    def __init__(self, enzymes):
+        self.patterns = site_patterns(enzymes)
+        self.names = list(enzymes)
+        longest = max((len(p[1]) for p in self.patterns), default=1)
+        self.k = min(longest, TABLE_K)
+        self.longest = longest
+        self.lengths = np.array([len(p[1]) for p in self.patterns], dtype=np.int64)
+        self.top = np.array([p[2] for p in self.patterns], dtype=np.int64)
+        self.bottom = np.array([p[3] for p in self.patterns], dtype=np.int64)
+        self.masks = np.array([allowed_masks(p[1], longest) for p in self.patterns],
+                              dtype=np.uint8).reshape(len(self.patterns), longest)
+
+        words = max(1, (len(self.patterns) + 63) // 64)
+        self.table = np.zeros((4 ** self.k, words), dtype=np.uint64)
+        for i, mask in enumerate(self.masks):
+            keys = expand_codes(mask[:self.k])
+            self.table[keys, i // 64] |= np.uint64(1 << (i % 64))
+
+    def scan(self, seq):
+        # (site start, pattern index) of every match, ordered by start
+        codes = encode(seq)
+        starts, found = [], []
+        for lo in range(0, len(codes), CHUNK_BASES):
+            hi = min(lo + CHUNK_BASES + self.longest - 1, len(codes))
+            s, p = self.scan_codes(codes[lo:hi], lo, len(codes))
+            keep = s < lo + CHUNK_BASES
+            starts.append(s[keep])
+            found.append(p[keep])
+        if not starts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        starts, found = np.concatenate(starts), np.concatenate(found)
+        order = np.lexsort((found, starts))
+        return starts[order], found[order]
+
+    def scan_codes(self, codes, offset, total):
+        # padded so every position has a full table key; the padding never matches
+        # because candidates are checked against the real bases below
+        padded = np.concatenate((codes, np.full(self.longest, AMBIGUOUS, dtype=np.uint8)))
+        kmers, _ = kmer_codes(padded & 3, self.k)
+        kmers = kmers[:len(codes)]
+        hits = self.table[kmers.astype(np.int64)]
+
+        starts, found = [], []
+        for word in range(hits.shape[1]):
+            rows = np.flatnonzero(hits[:, word])
+            bits = (hits[rows, word][:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+            r, b = np.nonzero(bits)
+            starts.append(rows[r])
+            found.append(word * 64 + b)
+        starts, found = np.concatenate(starts), np.concatenate(found)
+
+        # full check of each candidate: every site base must be an allowed real base
+        offsets = np.arange(self.longest)
+        cols = starts[:, None] + offsets
+        bases = padded[np.minimum(cols, len(padded) - 1)]
+        allowed = (self.masks[found] >> np.minimum(bases, 3)) & 1
+        inside = offsets < self.lengths[found][:, None]
+        ok = np.where(inside, (allowed == 1) & (bases < AMBIGUOUS), True).all(axis=1)
+        ok &= offset + starts + self.lengths[found] <= total
+        return starts[ok] + offset, found[ok]
+
+    def cut_sites(self, seq):
+        # {enzyme: {"sites": starts, "top": top-strand cuts, "bottom": bottom-strand cuts}}
+        starts, found = self.scan(seq)
+        pattern_names = np.array([p[0] for p in self.patterns])
+        result = {}
+        for name in self.names:
+            mine = pattern_names[found] == name
+            s = starts[mine]
+            result[name] = {
+                "sites": s,
+                "top": s + self.top[found[mine]],
+                "bottom": s + self.bottom[found[mine]],
+            }
+        return result
+
+
+@lru_cache(maxsize=32)
+def compiled_panel(panel_key):
+    return EnzymePanel({name: {"seq": seq, "cut_pos": top, "cut_bottom": bottom}
+                        for name, seq, top, bottom in panel_key})
+
+
+def panel_key(enzymes):
+    return tuple((name, data["seq"].upper(), data["cut_pos"],
+                  data.get("cut_bottom", len(data["seq"]) - data["cut_pos"]))
+                 for name, data in enzymes.items())
+
+
+def find_cuts(seq, enzymes=None):
+    # one scan for the whole panel (the built-in catalogue by default)
+    return compiled_panel(panel_key(enzymes or ENZYMES)).cut_sites(seq)
+
+
+def cut_positions(seq, enzymes=None):
+    # {enzyme: sorted distinct top-strand cut positions inside the sequence}
+    length = len(seq)
+    return {name: np.unique(sites["top"][(sites["top"] > 0) & (sites["top"] < length)])
+            for name, sites in find_cuts(seq, enzymes).items()}
+
+
+def fragment_lengths(length, cuts):
+    # linear molecule cut at the given top-strand positions
+    cuts = np.unique(np.asarray(cuts, dtype=np.int64))
+    cuts = cuts[(cuts > 0) & (cuts < length)]
+    return np.diff(np.concatenate(([0], cuts, [length])))
+
+
+def digest(seq, enzymes=None):
+    # fragment lengths when all enzymes of the panel cut together
+    cuts = cut_positions(seq, enzymes)
+    merged = np.concatenate(list(cuts.values())) if cuts else np.zeros(0, dtype=np.int64)
+    return fragment_lengths(len(seq), merged)
+
+
+def fragment_row(path, header, seq, key, bins):
+    panel = compiled_panel(key)
+    cuts = {name: sites["top"] for name, sites in panel.cut_sites(seq).items()}
+    merged = np.concatenate(list(cuts.values())) if cuts else np.zeros(0, dtype=np.int64)
+    fragments = fragment_lengths(len(seq), merged)
+    histogram = np.bincount(np.searchsorted(bins, fragments, side="right") - 1, minlength=len(bins))
+    sizes = [int(fragments.min()), int(np.median(fragments)), int(fragments.max())] if len(seq) else [0, 0, 0]
+    row = [os.path.basename(path), header.split()[0] if header.split() else "", len(seq), len(fragments)]
+    row += sizes
+    row += [len(cuts[name]) for name in panel.names]
+    return row + histogram.tolist()
+
+
+def digest_batch(records, key, bins):
+    # worker: one CSV row per (path, header, sequence) record
+    return [fragment_row(path, header, seq, key, bins) for path, header, seq in records]
+
+
+def record_batches(paths, batch_bases=BATCH_BASES):
+    batch, size = [], 0
+    for path in paths:
+        for header, seq in read_fasta_records(path):
+            batch.append((path, header, seq))
+            size += len(seq)
+            if size >= batch_bases:
+                yield batch
+                batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def digest_header(enzymes, bins):
+    edges = list(bins) + [None]
+    return (["file", "record", "length", "fragments", "min_fragment", "median_fragment",
+             "max_fragment"]
+            + [f"cuts_{name}" for name in enzymes]
+            + [f"size_{lo}_{hi}" if hi is not None else f"size_{lo}_plus"
+               for lo, hi in zip(edges, edges[1:])])
+
+
+def batch_digest(inputs, out_path, enzymes=None, processes=None, bins=SIZE_BINS,
+                 batch_bases=BATCH_BASES):
+    # digests every record of a folder / FASTA file / list of files on a process pool and
+    # streams one CSV row per record (fragment counts, size summary, cuts per enzyme and a
+    # fragment-size histogram); at most a few batches are in flight at a time
+    if isinstance(inputs, str):
+        inputs = fasta_files(inputs) if os.path.isdir(inputs) else [inputs]
+    enzymes = enzymes or ENZYMES
+    key = panel_key(enzymes)
+    bins = np.asarray(bins, dtype=np.int64)
+    written = 0
+
+    with open(out_path, "w", newline="") as out, ProcessPoolExecutor(processes) as pool:
+        writer = csv.writer(out)
+        writer.writerow(digest_header(enzymes, bins))
+        pending = deque()
+        limit = 2 * (processes or os.cpu_count() or 1)
+        for batch in record_batches(inputs, batch_bases):
+            pending.append(pool.submit(digest_batch, batch, key, bins))
+            while len(pending) >= limit or (pending and pending[0].done()):
+                rows = pending.popleft().result()
+                writer.writerows(rows)
+                written += len(rows)
+        while pending:
+            rows = pending.popleft().result()
+            writer.writerows(rows)
+            written += len(rows)
+    return written
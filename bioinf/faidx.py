@@ -0,0 +1,169 @@
+# .fai-style index for FASTA files (same columns as samtools faidx:
+# name, length, byte offset of the first base, bases per line, bytes per line).
+# IndexedFasta memory-maps the file and reads only the bytes a slice needs.
+# BGZF-compressed files are indexed on their uncompressed offsets and read through
+# the .gzi block table, so only the blocks covering a slice are inflated.
+
+import mmap
+import os
+
+from bioinf.bgzf import BgzfReader, is_bgzf, is_gzip
+from bioinf.fasta import open_fasta, open_fasta_binary
+
+
+def fai_path(path):
+    return path + ".fai"
+
+
+def build_fai(path):
+    entries = []
+    current = None
+    offset = 0
+
+    with open_fasta_binary(path) as f:
+        for number, line in enumerate(f, start=1):
+            if line.startswith(b">"):
+                name = line[1:].decode("utf-8", "ignore").split()
+                current = [name[0] if name else "", 0, offset + len(line), 0, 0]
+                entries.append(current)
+                last_line = False
+            elif current is not None:
+                bases = len(line.rstrip(b"\r\n"))
+                if bases and current[3] == 0:
+                    current[3] = bases
+                    current[4] = len(line)
+                # like samtools faidx: every line but the last of a record has the same
+                # width, otherwise byte offsets cannot be computed from the line length
+                ending = len(line) - bases
+                uneven = bases > current[3] or (ending and ending != current[4] - current[3])
+                if bases and (last_line or uneven):
+                    raise ValueError(f"{path}: line {number} of record {current[0]!r} breaks the "
+                                     f"{current[3]}-base line width; cannot index a FASTA "
+                                     "with uneven line lengths")
+                last_line = last_line or bases < current[3]
+                current[1] += bases
+            offset += len(line)
+
+    with open(fai_path(path), "w") as out:
+        for name, length, start, linebases, linewidth in entries:
+            out.write(f"{name}\t{length}\t{start}\t{linebases}\t{linewidth}\n")
+    return entries
+
+
+def load_fai(path):
+    index = fai_path(path)
+    if not os.path.exists(index) or os.path.getmtime(index) < os.path.getmtime(path):
+        return build_fai(path)
+
+    entries = []
+    with open_fasta(index) as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            entries.append([fields[0]] + [int(x) for x in fields[1:5]])
+    return entries
+
+
+class FastaRecord:
+
+    def __init__(self, fasta, name, length):
+        self.fasta = fasta
+        self.name = name
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, end, step = key.indices(self.length)
+            seq = self.fasta.fetch(self.name, start, max(start, end))
+            return seq if step == 1 else seq[::step]
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError("FastaRecord index out of range")
+        return self.fasta.fetch(self.name, key, key + 1)
+
+    def __str__(self):
+        return self.fasta.fetch(self.name)
+
+    def windows(self, size, step):
+        return self.fasta.windows(self.name, size, step)
+
+    def __repr__(self):
+        return f"FastaRecord({self.name!r}, length={self.length})"
+
+
+class IndexedFasta:
+
+    def __init__(self, path):
+        self.path = path
+        if is_gzip(path) and not is_bgzf(path):
+            raise ValueError(f"{path} is plain gzip; random access needs a BGZF file "
+                             "(recompress it with bgzip)")
+        self.entries = load_fai(path)
+        self.by_name = {e[0]: e for e in self.entries}
+        self.file = self.data = self.reader = None
+        if is_gzip(path):
+            self.reader = BgzfReader(path)
+        else:
+            self.file = open(path, "rb")
+            if os.path.getsize(path):
+                self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = b""
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            return
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        for e in self.entries:
+            yield FastaRecord(self, e[0], e[1])
+
+    def __getitem__(self, key):
+        e = self.entries[key] if isinstance(key, int) else self.by_name[key]
+        return FastaRecord(self, e[0], e[1])
+
+    @property
+    def names(self):
+        return [e[0] for e in self.entries]
+
+    def byte_offset(self, entry, pos):
+        _, _, offset, linebases, linewidth = entry
+        if linebases == 0:
+            return offset
+        return offset + (pos // linebases) * linewidth + pos % linebases
+
+    def read_bytes(self, a, b):
+        if self.reader is not None:
+            return self.reader.read(a, b)
+        return self.data[a:b]
+
+    def fetch(self, name, start=0, end=None):
+        entry = self.by_name[name]
+        length = entry[1]
+        end = length if end is None else min(end, length)
+        start = max(0, start)
+        if start >= end:
+            return ""
+        raw = self.read_bytes(self.byte_offset(entry, start), self.byte_offset(entry, end - 1) + 1)
+        return raw.translate(None, b"\r\n").decode("ascii", "replace").upper()
+
+    def windows(self, name, size, step):
+        length = self.by_name[name][1]
+        for start in range(0, length - size + 1, step):
+            yield start, self.fetch(name, start, start + size)
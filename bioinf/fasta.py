@@ -0,0 +1,100 @@
+# Shared FASTA reader for all the labs.
+# Records are yielded one at a time as (header, sequence) pairs, so a file is never
+# held in memory as a whole and multi-record files are not glued into one sequence.
+# Plain, gzip and BGZF (bgzip) files are all accepted.
+
+import gzip
+import io
+import os
+
+from bioinf.bgzf import GZIP_MAGIC, is_bgzf, open_bgzf
+
+CHUNK_SIZE = 1 << 20
+FASTA_EXTENSIONS = (".fasta", ".fa", ".fna", ".ffn", ".fasta.gz", ".fa.gz", ".fna.gz")
+
+
+def open_fasta_binary(path, threads=None):
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        if is_bgzf(path):
+            return open_bgzf(path, threads)
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def open_fasta(path, threads=None):
+    return io.TextIOWrapper(open_fasta_binary(path, threads), encoding="utf-8", errors="ignore")
+
+
+def read_fasta_chunks(path, chunk_size=CHUNK_SIZE):
+    # (record number, header, piece of sequence); a long record arrives in several
+    # pieces and a record with no sequence still yields one empty piece
+    number = -1
+    header = ""
+    emitted = False
+    pending = ""
+
+    with open_fasta(path) as f:
+        while True:
+            block = f.read(chunk_size)
+            text = pending + block
+            if block:
+                # keep the last partial line back so a header is never split
+                cut = text.rfind("\n") + 1
+                text, pending = text[:cut], text[cut:]
+                if not text:
+                    continue
+
+            pieces = ("\n" + text).split("\n>")
+            seq = "".join(pieces[0].split())
+            if seq:
+                if number < 0:
+                    number = 0
+                yield number, header, seq.upper()
+                emitted = True
+
+            for piece in pieces[1:]:
+                if number >= 0 and not emitted:
+                    yield number, header, ""
+                line, _, body = piece.partition("\n")
+                number += 1
+                header = line.strip()
+                emitted = False
+                seq = "".join(body.split())
+                if seq:
+                    yield number, header, seq.upper()
+                    emitted = True
+
+            if not block:
+                break
+
+    if number >= 0 and not emitted:
+        yield number, header, ""
+
+
+def read_fasta_records(path, chunk_size=CHUNK_SIZE):
+    current = None
+    header = ""
+    parts = []
+
+    for number, h, piece in read_fasta_chunks(path, chunk_size):
+        if number != current:
+            if current is not None:
+                yield header, "".join(parts)
+            current, header, parts = number, h, []
+        parts.append(piece)
+
+    if current is not None:
+        yield header, "".join(parts)
+
+
+def read_fasta(path):
+    for _, seq in read_fasta_records(path):
+        return seq
+    return ""
+
+
+def fasta_files(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(FASTA_EXTENSIONS))
@@ -0,0 +1,118 @@
+# Agarose gel rendering without per-band plotting.
+# Migration follows a log-linear model, distance = intercept + slope * log10(size),
+# fitted to a size ladder. All bands of all lanes are binned into one (lanes, height)
+# mass profile with a single bincount, blurred vertically, and spread over the lane
+# columns, giving a grayscale image that can be written as a PNG with no display.
+
+import struct
+import zlib
+
+import numpy as np
+
+LADDER_1KB = (250, 500, 750, 1000, 1500, 2000, 2500, 3000, 4000, 5000, 6000, 8000, 10000)
+# fraction of the run length travelled by each LADDER_1KB band on a 1% agarose gel
+LADDER_1KB_DISTANCES = (0.95, 0.82, 0.73, 0.66, 0.55, 0.47, 0.41, 0.37, 0.30, 0.25, 0.21,
+                        0.16, 0.12)
+LADDER_100BP = (100, 200, 300, 400, 500, 600, 700, 800, 900, 1000, 1200, 1500, 2000, 3000)
+# the same for LADDER_100BP on a 2% gel
+LADDER_100BP_DISTANCES = (0.92, 0.80, 0.71, 0.65, 0.60, 0.55, 0.52, 0.48, 0.45, 0.43, 0.38,
+                          0.33, 0.27, 0.18)
+
+
+def calibrate(sizes, distances):
+    # least-squares (slope, intercept) of distance against log10(size)
+    slope, intercept = np.polyfit(np.log10(np.asarray(sizes, dtype=float)), distances, 1)
+    return float(slope), float(intercept)
+
+
+DEFAULT_MODEL = calibrate(LADDER_1KB, LADDER_1KB_DISTANCES)
+FINE_MODEL = calibrate(LADDER_100BP, LADDER_100BP_DISTANCES)
+
+
+def migration(sizes, model=DEFAULT_MODEL):
+    # run fraction in [0, 1] for fragment sizes in bp
+    slope, intercept = model
+    sizes = np.maximum(np.asarray(sizes, dtype=float), 1.0)
+    return np.clip(intercept + slope * np.log10(sizes), 0.0, 1.0)
+
+
+def band_rows(sizes, height, margin, model=DEFAULT_MODEL):
+    return np.rint(margin + migration(sizes, model) * (height - 2 * margin - 1)).astype(np.int64)
+
+
+def gaussian_blur_rows(profile, sigma):
+    # blur each lane profile along the run direction
+    radius = max(1, int(3 * sigma))
+    offsets = np.arange(-radius, radius + 1)
+    weights = np.exp(-0.5 * (offsets / sigma) ** 2)
+    weights /= weights.sum()
+    padded = np.pad(profile, ((0, 0), (radius, radius)))
+    height = profile.shape[1]
+    return sum(w * padded[:, radius + o:radius + o + height] for o, w in zip(offsets, weights))
+
+
+def lane_columns(lanes, lane_width, gap, margin):
+    # lane index of every pixel column (-1 between lanes) and the image width
+    width = 2 * margin + lanes * lane_width + max(lanes - 1, 0) * gap
+    x = np.arange(width) - margin
+    lane = x // (lane_width + gap)
+    inside = (x >= 0) & (x % (lane_width + gap) < lane_width) & (lane < lanes)
+    return np.where(inside, lane, -1), width
+
+
+def render_gel(lanes, ladder=LADDER_1KB, model=DEFAULT_MODEL, height=400, lane_width=24,
+               gap=8, margin=16, sigma=1.5, copies=None):
+    # lanes: list of fragment-size lists; the ladder (if any) becomes the first lane.
+    # Band intensity is proportional to DNA mass, i.e. size * copies (equimolar by default).
+    lanes = [np.asarray(sizes, dtype=np.int64) for sizes in lanes]
+    if ladder is not None:
+        lanes = [np.asarray(ladder, dtype=np.int64)] + lanes
+        if copies is not None:
+            copies = [np.ones(len(ladder))] + list(copies)
+    n = len(lanes)
+    lane_id = np.repeat(np.arange(n), [len(sizes) for sizes in lanes])
+    sizes = np.concatenate(lanes) if n else np.zeros(0, dtype=np.int64)
+    mass = sizes.astype(float)
+    if copies is not None:
+        mass *= np.concatenate([np.asarray(c, dtype=float) for c in copies])
+
+    rows = band_rows(sizes, height, margin, model)
+    profile = np.bincount(lane_id * height + rows, weights=mass, minlength=n * height)
+    profile = gaussian_blur_rows(profile.reshape(n, height), sigma)
+    peak = profile.max(initial=0.0)
+    shade = np.sqrt(profile / peak) * 255 if peak > 0 else profile
+
+    column_lane, width = lane_columns(n, lane_width, gap, margin)
+    image = np.zeros((height, width), dtype=np.uint8)
+    inside = column_lane >= 0
+    image[:, inside] = shade[column_lane[inside]].T.astype(np.uint8)
+    image[max(margin - 5, 0):max(margin - 2, 0), inside] = 70
+    return image
+
+
+def lane_centers(lanes, lane_width=24, gap=8, margin=16):
+    return margin + np.arange(lanes) * (lane_width + gap) + (lane_width - 1) / 2
+
+
+def ladder_ticks(ladder=LADDER_1KB, model=DEFAULT_MODEL, height=400, margin=16):
+    # (pixel rows, labels) for annotating a rendered gel
+    return band_rows(ladder, height, margin, model), [f"{size} bp" for size in ladder]
+
+
+def png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def write_png(path, image):
+    # 8-bit grayscale (h, w) or RGB (h, w, 3) image
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    color_type = 2 if image.ndim == 3 else 0
+    rows = image.reshape(height, -1)
+    raw = np.hstack((np.zeros((height, 1), dtype=np.uint8), rows)).tobytes()
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(png_chunk(b"IHDR", header))
+        f.write(png_chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(png_chunk(b"IEND", b""))
@@ -0,0 +1,124 @@
+# k-mer spectra from 2-bit integer codes.
+# Every k-mer is turned into one integer (2 bits per base, first base in the high
+# bits) in a single vectorized sweep, k-mers touching an ambiguous base are masked
+# out, and counts come from a dense 4^k bincount for small k or from sorting the
+# codes for large k.
+
+import numpy as np
+
+from bioinf.packed import AMBIGUOUS, BASES, LETTERS, encode
+
+MAX_K = 32
+DENSE_MAX_K = 12
+
+
+def kmer_codes(seq, k):
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}")
+    codes = encode(seq)
+    m = len(codes) - k + 1
+    if m <= 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+
+    # build the k-mers from blocks of 1, 2, 4, ... bases (the binary digits of k), so
+    # long k-mers take log2(k) passes over the sequence instead of k
+    block = (codes & 3).astype(np.uint64)
+    kmers, have, width = None, 0, 1
+    while True:
+        if k & width:
+            part = block[have:have + m]
+            kmers = part.copy() if kmers is None else (kmers[:m] << np.uint64(2 * width)) | part
+            have += width
+        if have == k:
+            break
+        block = (block[:-width] << np.uint64(2 * width)) | block[width:]
+        width *= 2
+
+    ambiguous = np.concatenate(([0], np.cumsum(codes == AMBIGUOUS)))
+    valid = ambiguous[k:] == ambiguous[:m]
+    return kmers, valid
+
+
+def encode_kmer(kmer):
+    code = 0
+    for c in encode(kmer.upper()):
+        if c == AMBIGUOUS:
+            raise ValueError(f"{kmer!r} contains an ambiguous base")
+        code = code << 2 | int(c)
+    return code
+
+
+def decode_kmer(code, k):
+    code = int(code)
+    return "".join(BASES[(code >> 2 * (k - 1 - j)) & 3] for j in range(k))
+
+
+def decode_kmers(codes, k):
+    codes = np.asarray(codes, dtype=np.uint64)
+    shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+    letters = LETTERS[((codes[:, None] >> shifts) & np.uint64(3)).astype(np.uint8)]
+    return [b.decode("ascii") for b in np.ascontiguousarray(letters).view(f"S{k}").ravel()]
+
+
+def revcomp_kmers(codes, k):
+    # reverse complement of packed k-mers: complement all bits, then reverse the 2-bit groups
+    x = ~np.asarray(codes, dtype=np.uint64)
+    for shift, mask in ((2, 0x3333333333333333), (4, 0x0F0F0F0F0F0F0F0F),
+                        (8, 0x00FF00FF00FF00FF), (16, 0x0000FFFF0000FFFF)):
+        shift, mask = np.uint64(shift), np.uint64(mask)
+        x = ((x >> shift) & mask) | ((x & mask) << shift)
+    x = (x >> np.uint64(32)) | (x << np.uint64(32))
+    return x >> np.uint64(64 - 2 * k)
+
+
+def canonical_kmer_codes(seq, k):
+    # min(k-mer, reverse complement) at every position, with the same validity mask
+    codes = encode(seq)
+    kmers, valid = kmer_codes(codes, k)
+    complement = np.where(codes < AMBIGUOUS, 3 - codes, codes).astype(np.uint8)
+    reverse, _ = kmer_codes(complement[::-1], k)
+    return np.minimum(kmers, reverse[::-1]), valid
+
+
+def use_dense(k, n):
+    return k <= DENSE_MAX_K and (k <= 8 or 4 ** k <= 16 * n)
+
+
+def kmer_count_array(seq, k):
+    # dense 4^k table; index i is the k-mer decode_kmer(i, k)
+    if k > DENSE_MAX_K:
+        raise ValueError(f"a dense table is only built up to k={DENSE_MAX_K}")
+    kmers, valid = kmer_codes(seq, k)
+    return np.bincount(kmers[valid].astype(np.int64), minlength=4 ** k)
+
+
+def count_kmers(seq, k):
+    # sorted distinct k-mer codes and their counts
+    kmers, valid = kmer_codes(seq, k)
+    kmers = kmers[valid]
+    if use_dense(k, len(kmers)):
+        counts = np.bincount(kmers.astype(np.int64), minlength=4 ** k)
+        observed = np.flatnonzero(counts)
+        return observed.astype(np.uint64), counts[observed]
+    return np.unique(kmers, return_counts=True)
+
+
+def kmer_spectrum(seq, k, include_absent=False):
+    # (observed k-mers, {k-mer: percentage of all valid k-mer positions})
+    if include_absent:
+        counts = kmer_count_array(seq, k)
+        observed = np.arange(4 ** k)
+    else:
+        observed, counts = count_kmers(seq, k)
+    total = int(counts.sum())
+    names = decode_kmers(observed, k)
+    frequencies = {
+        name: (int(c) / total * 100 if total else 0.0) for name, c in zip(names, counts)
+    }
+    present = [name for name, c in zip(names, counts) if c]
+    return present, frequencies
+
+
+def spectra(seq, ks=range(1, 13)):
+    codes = encode(seq)
+    return {k: kmer_spectrum(codes, k) for k in ks}
@@ -0,0 +1,279 @@
+# Seed-and-extend read mapper.
+# The reference is indexed once as a sorted array of k-mer codes with their positions
+# (saved next to the FASTA as an .npz). A batch of reads is mapped with array passes:
+# the seeds of every read and both strands are looked up with searchsorted, hits vote
+# for a diagonal, and the best diagonal of each read is checked without gaps and,
+# when that fails, with a banded edit-distance alignment run on all such reads at once.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bioinf.fasta import read_fasta_records
+from bioinf.kmers import kmer_codes
+from bioinf.packed import AMBIGUOUS, encode
+
+BAND = 8
+MAX_OCCURRENCES = 64
+GAPPED_MISMATCHES = 3
+BATCH_READS = 20_000
+LOADED = {}
+
+
+class KmerIndex:
+
+    def __init__(self, ref, kmers, positions, k, names, offsets, path=None):
+        self.ref = ref
+        self.kmers = kmers
+        self.positions = positions
+        self.k = k
+        self.names = list(names)
+        self.offsets = offsets
+        self.path = path
+
+    @classmethod
+    def build(cls, records, k=15):
+        # records: a sequence or (name, sequence) pairs; records are joined with N
+        if isinstance(records, (str, bytes, np.ndarray)):
+            records = [("", records)]
+        names, parts, offsets, size = [], [], [], 0
+        for name, seq in records:
+            codes = encode(seq)
+            names.append(name.split()[0] if name.split() else "")
+            offsets.append(size)
+            parts += [codes, np.full(1, AMBIGUOUS, dtype=np.uint8)]
+            size += len(codes) + 1
+        ref = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+
+        kmers, valid = kmer_codes(ref, k)
+        positions = np.flatnonzero(valid).astype(np.int64)
+        order = np.argsort(kmers[positions], kind="stable")
+        return cls(ref, kmers[positions][order], positions[order], k, names, np.array(offsets))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, ref=self.ref, kmers=self.kmers, positions=self.positions,
+                     k=self.k, names=np.array(self.names), offsets=self.offsets)
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["ref"], data["kmers"], data["positions"], int(data["k"]),
+                       data["names"].tolist(), data["offsets"], path)
+
+    def locate(self, positions):
+        # global positions -> (record names, positions within the record)
+        record = np.searchsorted(self.offsets, positions, side="right") - 1
+        return [self.names[r] for r in record], positions - self.offsets[record]
+
+
+def index_path(path, k):
+    return f"{path}.k{k}.npz"
+
+
+def reference_index(path, k=15):
+    # load the saved index of a FASTA file, building it when missing or stale
+    saved = index_path(path, k)
+    if os.path.exists(saved) and os.path.getmtime(saved) >= os.path.getmtime(path):
+        return KmerIndex.load(saved)
+    index = KmerIndex.build(read_fasta_records(path), k)
+    index.save(saved)
+    return index
+
+
+def read_matrix(reads):
+    # (n, longest) code matrix padded with an out-of-alphabet value, and read lengths
+    lengths = np.array([len(r) for r in reads], dtype=np.int64)
+    codes = encode("".join(reads))
+    matrix = np.full((len(reads), lengths.max(initial=0)), 5, dtype=np.uint8)
+    rows = np.repeat(np.arange(len(reads)), lengths)
+    cols = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    matrix[rows, cols] = codes
+    return matrix, lengths
+
+
+def reverse_complement_matrix(matrix, lengths):
+    cols = lengths[:, None] - 1 - np.arange(matrix.shape[1])
+    out = np.take_along_axis(matrix, np.maximum(cols, 0), axis=1)
+    out = np.where(out < AMBIGUOUS, 3 - out, out).astype(np.uint8)
+    out[cols < 0] = 5
+    return out
+
+
+def seed_hits(index, matrix, lengths, step):
+    # (candidate, diagonal) for every index hit of every seed; candidate = read * 2 + strand
+    k = index.k
+    n, width = matrix.shape
+    if width < k:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    flat = matrix.ravel()
+    kmers, valid = kmer_codes(np.where(flat > AMBIGUOUS, AMBIGUOUS, flat), k)
+    kmers = np.append(kmers, np.zeros(k - 1, dtype=np.uint64)).reshape(n, width)
+    valid = np.append(valid, np.zeros(k - 1, dtype=bool)).reshape(n, width)
+
+    offsets = np.arange(0, width - k + 1, step)
+    rows, cols = np.nonzero(valid[:, offsets] & (offsets + k <= lengths[:, None]))
+    cols = offsets[cols]
+    codes = kmers[rows, cols]
+
+    # look up each distinct seed once, in sorted order
+    distinct, inverse = np.unique(codes, return_inverse=True)
+    lo = np.searchsorted(index.kmers, distinct, side="left")[inverse]
+    hi = np.searchsorted(index.kmers, distinct, side="right")[inverse]
+    count = hi - lo
+    count[count > MAX_OCCURRENCES] = 0
+    seed = np.repeat(np.arange(len(codes)), count)
+    hit = lo[seed] + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    return rows[seed], index.positions[hit] - cols[seed]
+
+
+def best_diagonals(candidates, diagonals, n):
+    # per read: best candidate, its diagonal and votes, and the votes of the runner-up;
+    # hits of one candidate within BAND diagonals of each other vote together
+    order = np.lexsort((diagonals, candidates))
+    candidates, diagonals = candidates[order], diagonals[order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (candidates[1:] != candidates[:-1]) | (np.diff(diagonals) > BAND)
+    cluster = np.cumsum(new) - 1
+    votes = np.bincount(cluster)
+    first = np.flatnonzero(new)
+    cluster_candidate = candidates[first]
+    cluster_diagonal = diagonals[first + votes // 2]
+
+    read = cluster_candidate // 2
+    ranked = np.lexsort((-votes, read))
+    best = np.full(n, -1, dtype=np.int64)
+    second = np.zeros(n, dtype=np.int64)
+    head = np.ones(len(ranked), dtype=bool)
+    head[1:] = read[ranked][1:] != read[ranked][:-1]
+    best[read[ranked][head]] = ranked[head]
+    runner = np.flatnonzero(~head)
+    runner = runner[head[runner - 1]]
+    second[read[ranked][runner]] = votes[ranked][runner]
+
+    found = best >= 0
+    strand = np.zeros(n, dtype=bool)
+    diagonal = np.zeros(n, dtype=np.int64)
+    best_votes = np.zeros(n, dtype=np.int64)
+    strand[found] = cluster_candidate[best[found]] % 2 == 1
+    diagonal[found] = cluster_diagonal[best[found]]
+    best_votes[found] = votes[best[found]]
+    return found, strand, diagonal, best_votes, second
+
+
+def reference_rows(ref, starts, width):
+    # (n, width) reference windows, ambiguous outside the reference
+    cols = starts[:, None] + np.arange(width)
+    inside = (cols >= 0) & (cols < len(ref))
+    return np.where(inside, ref[np.clip(cols, 0, max(len(ref) - 1, 0))], AMBIGUOUS).astype(np.uint8)
+
+
+def banded_alignment(reads, lengths, windows):
+    # edit distance of each read against its window, with the read allowed to start
+    # at any of the 2 * BAND + 1 diagonals; returns (edits, start offset in the window).
+    # Each cell holds cost << 8 | start offset, so taking minima carries the start
+    # along, and deletions along a row become a running minimum of (cell - column).
+    n, width = reads.shape
+    band = 2 * BAND + 1
+    cells = np.arange(band)
+    step = np.int32(1 << 8)
+    columns = (cells << 8).astype(np.int32)
+    state = np.tile(cells.astype(np.int32), (n, 1))
+    for i in range(width):
+        row = state + (reads[:, i, None] != windows[:, i + cells]) * step
+        np.minimum(row[:, :-1], state[:, 1:] + step, out=row[:, :-1])
+        row = np.minimum.accumulate(row - columns, axis=1) + columns
+        state = np.where((i < lengths)[:, None], row, state)
+    best = state.min(axis=1)
+    return best >> 8, best & 255
+
+
+def mapping_quality(votes, second):
+    # 0 when the runner-up diagonal is as well supported, 60 for clear unique hits
+    votes = np.maximum(votes, 1)
+    quality = 40 * (1 - second / votes) * np.log(votes + 1)
+    return np.clip(quality, 0, 60).astype(np.int64)
+
+
+def map_batch(index, reads, step=None, max_error=0.1):
+    # position (-1 when unmapped), reverse-strand flag, mapping quality and edit count
+    n = len(reads)
+    step = step or max(1, index.k // 2)
+    forward, lengths = read_matrix(reads)
+    reverse = reverse_complement_matrix(forward, lengths)
+    both = np.empty((2 * n, forward.shape[1]), dtype=np.uint8)
+    both[0::2], both[1::2] = forward, reverse
+
+    candidates, diagonals = seed_hits(index, both, np.repeat(lengths, 2), step)
+    found, strand, diagonal, votes, second = best_diagonals(candidates, diagonals, n)
+
+    oriented = np.where(strand[:, None], reverse, forward)
+    width = oriented.shape[1]
+    windows = reference_rows(index.ref, diagonal, width)
+    mismatches = ((oriented != windows) & (np.arange(width) < lengths[:, None])).sum(axis=1)
+    position = diagonal.copy()
+    edits = mismatches
+
+    gapped = np.flatnonzero(found & (mismatches > GAPPED_MISMATCHES))
+    if len(gapped):
+        band_windows = reference_rows(index.ref, diagonal[gapped] - BAND, width + 2 * BAND)
+        cost, start = banded_alignment(oriented[gapped], lengths[gapped], band_windows)
+        improved = cost < mismatches[gapped]
+        position[gapped[improved]] += start[improved] - BAND
+        edits[gapped[improved]] = cost[improved]
+
+    mapped = found & (edits <= max_error * lengths)
+    mapq = mapping_quality(votes, second)
+    return {
+        "position": np.where(mapped, position, -1),
+        "reverse": strand & mapped,
+        "mapq": np.where(mapped, mapq, 0).astype(np.uint8),
+        "edits": np.where(mapped, edits, -1),
+    }
+
+
+def map_batch_file(path, reads, step, max_error):
+    # worker side of map_reads: the index is loaded once per process
+    if path not in LOADED:
+        LOADED[path] = KmerIndex.load(path)
+    return map_batch(LOADED[path], reads, step, max_error)
+
+
+def batches(reads, size):
+    for i in range(0, len(reads), size):
+        yield reads[i:i + size]
+
+
+def map_reads(index, reads, step=None, max_error=0.1, processes=1, batch_size=BATCH_READS):
+    # index: a KmerIndex or the path of a saved one (needed for processes > 1)
+    reads = list(reads)
+    if isinstance(index, str):
+        path, index = index, None
+    else:
+        path = index.path
+
+    if processes == 1 or path is None:
+        if index is None:
+            index = KmerIndex.load(path)
+        parts = [map_batch(index, batch, step, max_error) for batch in batches(reads, batch_size)]
+    else:
+        chunks = list(batches(reads, batch_size))
+        n = len(chunks)
+        with ProcessPoolExecutor(processes) as pool:
+            parts = list(pool.map(map_batch_file, [path] * n, chunks, [step] * n, [max_error] * n))
+    if not parts:
+        return {key: np.zeros(0, dtype=int) for key in ("position", "reverse", "mapq", "edits")}
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def placed_reads(reads, mapping, min_mapq=0):
+    # (start, forward-strand read) pairs for pileup-based reconstruction
+    complement = str.maketrans("ACGTN", "TGCAN")
+    placed = []
+    for read, start, reverse, mapq in zip(reads, mapping["position"].tolist(),
+                                          mapping["reverse"].tolist(), mapping["mapq"].tolist()):
+        if start >= 0 and mapq >= min_mapq:
+            placed.append((start, read[::-1].translate(complement) if reverse else read))
+    return placed
@@ -0,0 +1,99 @@
+# Melting temperature along a sequence, one value per sliding window.
+# Wallace (4*GC + 2*AT), the salt-adjusted GC formula from L3 and the SantaLucia
+# (1998) unified nearest-neighbor model are all read from prefix sums, so a
+# whole-genome Tm track is O(n) whatever the window size.
+
+import math
+
+import numpy as np
+
+from bioinf.packed import AMBIGUOUS, BASES, encode
+from bioinf.windows import counts_at, window_starts
+
+R = 1.987
+
+# SantaLucia 1998 unified parameters, dH in kcal/mol and dS in cal/(K*mol),
+# indexed by the top-strand dinucleotide
+NN_PARAMS = {
+    "AA": (-7.9, -22.2), "TT": (-7.9, -22.2),
+    "AT": (-7.2, -20.4), "TA": (-7.2, -21.3),
+    "CA": (-8.5, -22.7), "TG": (-8.5, -22.7),
+    "GT": (-8.4, -22.4), "AC": (-8.4, -22.4),
+    "CT": (-7.8, -21.0), "AG": (-7.8, -21.0),
+    "GA": (-8.2, -22.2), "TC": (-8.2, -22.2),
+    "CG": (-10.6, -27.2), "GC": (-9.8, -24.4),
+    "GG": (-8.0, -19.9), "CC": (-8.0, -19.9),
+}
+INIT_GC = (0.1, -2.8)
+INIT_AT = (2.3, 4.1)
+
+DH = np.zeros((5, 5))
+DS = np.zeros((5, 5))
+for (_a, _b), (_dh, _ds) in NN_PARAMS.items():
+    DH[BASES.index(_a), BASES.index(_b)] = _dh
+    DS[BASES.index(_a), BASES.index(_b)] = _ds
+
+# initiation terms by terminal base (A, C, G, T, ambiguous)
+INIT_DH = np.array([INIT_AT[0], INIT_GC[0], INIT_GC[0], INIT_AT[0], 0.0])
+INIT_DS = np.array([INIT_AT[1], INIT_GC[1], INIT_GC[1], INIT_AT[1], 0.0])
+
+
+def base_counts(codes, window, step):
+    starts = window_starts(len(codes), window, step)
+    return starts, counts_at(codes, starts, window, 4)
+
+
+def tm_wallace(seq, window, step=1):
+    _, counts = base_counts(encode(seq), window, step)
+    return 2 * (counts[:, 0] + counts[:, 3]) + 4 * (counts[:, 1] + counts[:, 2])
+
+
+def tm_salt_adjusted(seq, window, step=1, na=0.05):
+    _, counts = base_counts(encode(seq), window, step)
+    gc_percent = (counts[:, 1] + counts[:, 2]) * 100 / window
+    return 81.5 + 16.6 * math.log10(na) + 0.41 * gc_percent - 600 / window
+
+
+def nn_sums(codes, window, step):
+    # dH and dS of every window, NaN where the window has an ambiguous base
+    starts = window_starts(len(codes), window, step)
+    steps = max(len(codes) - 1, 0)
+    pairs = (codes[:steps], codes[1:steps + 1])
+
+    dh_cum = np.zeros(steps + 1)
+    ds_cum = np.zeros(steps + 1)
+    np.cumsum(DH[pairs], out=dh_cum[1:])
+    np.cumsum(DS[pairs], out=ds_cum[1:])
+    dh = dh_cum[starts + window - 1] - dh_cum[starts]
+    ds = ds_cum[starts + window - 1] - ds_cum[starts]
+
+    first = codes[starts]
+    last = codes[starts + window - 1]
+    dh += INIT_DH[first] + INIT_DH[last]
+    ds += INIT_DS[first] + INIT_DS[last]
+
+    ambiguous = np.zeros(len(codes) + 1, dtype=np.int32)
+    np.cumsum(codes == AMBIGUOUS, out=ambiguous[1:])
+    invalid = ambiguous[starts + window] != ambiguous[starts]
+    dh[invalid] = np.nan
+    ds[invalid] = np.nan
+    return dh, ds
+
+
+def tm_nearest_neighbor(seq, window, step=1, na=0.05, dna_conc=50e-9):
+    # two-state Tm for non-self-complementary duplexes with the SantaLucia salt
+    # correction on the entropy term
+    if window < 2:
+        raise ValueError("the nearest-neighbor model needs windows of at least 2 bases")
+    dh, ds = nn_sums(encode(seq), window, step)
+    ds = ds + 0.368 * (window - 1) * math.log(na)
+    return dh * 1000 / (ds + R * math.log(dna_conc / 4)) - 273.15
+
+
+def tm_profiles(seq, window, step=1, na=0.05, dna_conc=50e-9):
+    codes = encode(seq)
+    return {
+        "wallace": tm_wallace(codes, window, step),
+        "salt_adjusted": tm_salt_adjusted(codes, window, step, na),
+        "nearest_neighbor": tm_nearest_neighbor(codes, window, step, na, dna_conc),
+    }
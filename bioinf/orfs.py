@@ -0,0 +1,144 @@
+# Streaming ORF finder over both strands.
+# The sequence is read piece by piece; in every piece the start and stop codons of
+# all six frames are located with array lookups and paired with searchsorted, while
+# a few positions per frame are carried over to the next piece. ORFs are yielded as
+# soon as their stop (forward strand) or the next upstream stop (reverse strand) is
+# seen, so the genome is never held in memory.
+#
+# Forward strand: the ORF runs from the first start codon after a stop to the next
+# stop. Reverse strand, read in forward coordinates: a reverse-complemented stop
+# (e.g. TTA) is the left end and the ORF runs to the last reverse-complemented start
+# (CAT) before the next such stop. Coordinates are 0-based, end-exclusive and
+# include the stop codon.
+
+from itertools import chain, groupby
+
+import numpy as np
+
+from bioinf.fasta import CHUNK_SIZE, read_fasta_chunks
+from bioinf.packed import AMBIGUOUS, encode
+from bioinf.translate import codon_table
+
+RC_INDEX = np.array([(3 - i % 4) * 16 + (3 - i // 4 % 4) * 4 + (3 - i // 16)
+                     for i in range(64)] + [64])
+
+
+def codon_flags(table, start_codons):
+    stops = np.append(codon_table(table)[:64] == ord("*"), False)
+    starts = np.zeros(65, dtype=bool)
+    for codon in start_codons:
+        c = encode(codon)
+        starts[c[0] * 16 + c[1] * 4 + c[2]] = True
+    return stops, starts, stops[RC_INDEX], starts[RC_INDEX]
+
+
+class FrameState:
+
+    def __init__(self):
+        self.last_stop = None       # forward: position of the last stop codon
+        self.first_start = None     # forward: first start after it
+        self.last_rc_stop = None    # reverse: left end of the open segment
+        self.last_rc_start = None   # reverse: last CAT after it
+
+
+def forward_orfs(state, starts, stops):
+    found = []
+    if len(stops):
+        prev = np.concatenate(([-1 if state.last_stop is None else state.last_stop], stops[:-1]))
+        # first start after the previous stop, -1 when there is none
+        first = np.append(starts, -1)[np.searchsorted(starts, prev, side="right")]
+        if state.first_start is not None:
+            first[0] = state.first_start
+        ok = (first >= 0) & (first < stops)
+        found = list(zip(first[ok].tolist(), (stops[ok] + 3).tolist()))
+
+        state.last_stop = int(stops[-1])
+        later = starts[starts > stops[-1]]
+        state.first_start = int(later[0]) if len(later) else None
+    elif state.first_start is None and len(starts):
+        state.first_start = int(starts[0])
+    return found
+
+
+def reverse_orfs(state, starts, stops):
+    found = []
+    if len(stops):
+        left = np.concatenate(([-1 if state.last_rc_stop is None else state.last_rc_stop],
+                               stops[:-1]))
+        # last start before each stop, -1 when there is none
+        last = np.append(-1, starts)[np.searchsorted(starts, stops, side="left")]
+        if last[0] <= left[0] and state.last_rc_start is not None:
+            last[0] = state.last_rc_start
+        ok = last > left
+        if state.last_rc_stop is None:
+            ok[0] = False
+        found = list(zip(left[ok].tolist(), (last[ok] + 3).tolist()))
+
+        state.last_rc_stop = int(stops[-1])
+        later = starts[starts > stops[-1]]
+        state.last_rc_start = int(later[-1]) if len(later) else None
+    elif len(starts):
+        state.last_rc_start = int(starts[-1])
+    return found
+
+
+def orf_record(start, end, strand):
+    return {"start": start, "end": end, "strand": strand, "phase": start % 3,
+            "length": end - start}
+
+
+def stream_orfs(chunks, min_len=300, table=1, start_codons=("ATG",)):
+    # chunks are consecutive pieces of one sequence (str, bytes, codes or PackedSequence)
+    stop_flag, start_flag, rc_stop_flag, rc_start_flag = codon_flags(table, start_codons)
+    states = [FrameState() for _ in range(3)]
+    tail = np.zeros(0, dtype=np.uint8)
+    offset = 0
+
+    for chunk in chunks:
+        buf = np.concatenate((tail, encode(chunk)))
+        m = len(buf) - 2
+        if m <= 0:
+            tail = buf
+            continue
+
+        b = buf.astype(np.int64)
+        idx = b[:m] * 16 + b[1:m + 1] * 4 + b[2:]
+        idx[(buf[:m] == AMBIGUOUS) | (buf[1:m + 1] == AMBIGUOUS) | (buf[2:] == AMBIGUOUS)] = 64
+
+        found = []
+        for phase in range(3):
+            local = (phase - offset) % 3
+            frame = idx[local::3]
+            pos = np.arange(local, m, 3) + offset
+            state = states[phase]
+            found += [(a, e, "+") for a, e in
+                      forward_orfs(state, pos[start_flag[frame]], pos[stop_flag[frame]])]
+            found += [(a, e, "-") for a, e in
+                      reverse_orfs(state, pos[rc_start_flag[frame]], pos[rc_stop_flag[frame]])]
+
+        found.sort(key=lambda orf: orf[1])
+        for start, end, strand in found:
+            if end - start >= min_len:
+                yield orf_record(start, end, strand)
+
+        tail = buf[m:]
+        offset += m
+
+    for state in states:
+        if state.last_rc_stop is not None and state.last_rc_start is not None:
+            start, end = state.last_rc_stop, state.last_rc_start + 3
+            if end - start >= min_len:
+                yield orf_record(start, end, "-")
+
+
+def find_orfs(seq, min_len=300, table=1, start_codons=("ATG",)):
+    return stream_orfs([seq], min_len, table, start_codons)
+
+
+def fasta_orfs(path, min_len=300, table=1, start_codons=("ATG",), chunk_size=CHUNK_SIZE):
+    # streams (header, orf) for every record of a FASTA file
+    for _, record in groupby(read_fasta_chunks(path, chunk_size), key=lambda r: r[0]):
+        _, header, first = next(record)
+        pieces = chain([first], (piece for _, _, piece in record))
+        for orf in stream_orfs(pieces, min_len, table, start_codons):
+            yield header, orf
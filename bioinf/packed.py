@@ -0,0 +1,174 @@
+# Compact nucleotide sequence: 2 bits per base (4 bases per byte) plus a run-length
+# table for N and the other ambiguity letters, which cannot be stored in 2 bits.
+# Integer codes used everywhere in bioinf: A=0, C=1, G=2, T/U=3, anything else=4.
+
+import numpy as np
+
+from bioinf.fasta import read_fasta_records
+
+BASES = "ACGT"
+AMBIGUOUS = 4
+
+CODES = np.full(256, AMBIGUOUS, dtype=np.uint8)
+for _code, _letters in enumerate(("Aa", "Cc", "Gg", "TtUu")):
+    for _letter in _letters:
+        CODES[ord(_letter)] = _code
+
+LETTERS = np.frombuffer(b"ACGTN", dtype=np.uint8)
+
+IUPAC_COMPLEMENT = bytes.maketrans(b"ACGTURYKMBVDHSWN", b"TGCAAYRMKVBHDSWN")
+
+
+def encode(seq):
+    if isinstance(seq, PackedSequence):
+        return seq.codes()
+    if isinstance(seq, np.ndarray):
+        return seq
+    if isinstance(seq, str):
+        seq = seq.encode("ascii", "replace")
+    return CODES[np.frombuffer(seq, dtype=np.uint8)]
+
+
+def decode(codes):
+    return LETTERS[codes].tobytes().decode("ascii")
+
+
+def pack(codes):
+    n = len(codes)
+    padded = np.zeros((n + 3) // 4 * 4, dtype=np.uint8)
+    padded[:n] = codes & 3
+    quads = padded.reshape(-1, 4)
+    return (quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2) | quads[:, 3]
+
+
+def unpack(packed, start, stop):
+    first = start // 4
+    block = packed[first:(stop + 3) // 4]
+    out = np.empty((len(block), 4), dtype=np.uint8)
+    out[:, 0] = block >> 6
+    out[:, 1] = (block >> 4) & 3
+    out[:, 2] = (block >> 2) & 3
+    out[:, 3] = block & 3
+    return out.ravel()[start - first * 4:stop - first * 4]
+
+
+def mask_runs(raw, codes):
+    # runs of identical ambiguity letters as (starts, ends, letters)
+    amb = codes == AMBIGUOUS
+    if not amb.any():
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, b""
+    idx = np.flatnonzero(amb)
+    new_run = np.ones(len(idx), dtype=bool)
+    new_run[1:] = (np.diff(idx) != 1) | (raw[idx[1:]] != raw[idx[:-1]])
+    starts = idx[new_run]
+    ends = np.append(idx[np.flatnonzero(new_run)[1:] - 1], idx[-1]) + 1
+    return starts.astype(np.int64), ends.astype(np.int64), raw[starts].tobytes()
+
+
+class PackedSequence:
+
+    def __init__(self, packed, length, mask_starts, mask_ends, mask_letters,
+                 start=0, stop=None, reverse=False):
+        self.packed = packed
+        self.length = length
+        self.mask_starts = mask_starts
+        self.mask_ends = mask_ends
+        self.mask_letters = mask_letters
+        self.start = start
+        self.stop = length if stop is None else stop
+        self.reverse = reverse
+
+    @classmethod
+    def from_string(cls, seq):
+        if isinstance(seq, str):
+            seq = seq.encode("ascii", "replace")
+        raw = np.frombuffer(seq, dtype=np.uint8)
+        codes = CODES[raw]
+        starts, ends, letters = mask_runs(raw, codes)
+        return cls(pack(codes), len(codes), starts, ends, letters)
+
+    @classmethod
+    def from_codes(cls, codes):
+        # ambiguous codes come back as N
+        starts, ends, letters = mask_runs(LETTERS[codes], codes)
+        return cls(pack(codes), len(codes), starts, ends, letters)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            a, b, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("PackedSequence views only support step 1")
+            b = max(a, b)
+            if self.reverse:
+                return self._view(self.stop - b, self.stop - a, True)
+            return self._view(self.start + a, self.start + b, False)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("PackedSequence index out of range")
+        return str(self[key:key + 1])
+
+    def _view(self, start, stop, reverse):
+        return PackedSequence(self.packed, self.length, self.mask_starts, self.mask_ends,
+                              self.mask_letters, start, stop, reverse)
+
+    def window(self, start, end):
+        return self[start:end]
+
+    def windows(self, size, step=1):
+        for start in range(0, len(self) - size + 1, step):
+            yield start, self[start:start + size]
+
+    def reverse_complement(self):
+        return self._view(self.start, self.stop, not self.reverse)
+
+    def _mask_overlaps(self):
+        lo = np.searchsorted(self.mask_ends, self.start, side="right")
+        hi = np.searchsorted(self.mask_starts, self.stop, side="left")
+        return range(lo, hi)
+
+    def codes(self):
+        codes = unpack(self.packed, self.start, self.stop)
+        for r in self._mask_overlaps():
+            codes[max(self.mask_starts[r], self.start) - self.start:
+                  min(self.mask_ends[r], self.stop) - self.start] = AMBIGUOUS
+        if self.reverse:
+            codes = codes[::-1]
+            codes = np.where(codes < AMBIGUOUS, 3 - codes, codes).astype(np.uint8)
+        return codes
+
+    def valid(self):
+        return self.codes() < AMBIGUOUS
+
+    def __str__(self):
+        raw = LETTERS[unpack(self.packed, self.start, self.stop)]
+        for r in self._mask_overlaps():
+            raw[max(self.mask_starts[r], self.start) - self.start:
+                min(self.mask_ends[r], self.stop) - self.start] = self.mask_letters[r]
+        text = raw.tobytes()
+        if self.reverse:
+            text = text.translate(IUPAC_COMPLEMENT)[::-1]
+        return text.decode("ascii")
+
+    def __repr__(self):
+        return f"PackedSequence(length={len(self)}, reverse={self.reverse})"
+
+    @property
+    def nbytes(self):
+        return (self.packed.nbytes + self.mask_starts.nbytes + self.mask_ends.nbytes
+                + len(self.mask_letters))
+
+
+def read_packed_records(path):
+    for header, seq in read_fasta_records(path):
+        yield header, PackedSequence.from_string(seq)
+
+
+def read_packed(path):
+    for _, seq in read_packed_records(path):
+        return seq
+    return PackedSequence.from_string("")
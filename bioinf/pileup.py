@@ -0,0 +1,101 @@
+# Per-position base counts for placed reads.
+# Reads are added in batches: every base becomes one flat index position * 5 + code,
+# and a single bincount over the span the batch touches folds it into an (L, 5) count
+# table (A, C, G, T, N), so a batch costs its own size, not the genome length.
+
+import numpy as np
+
+from bioinf.packed import AMBIGUOUS, decode, encode
+
+PHRED_OFFSET = 33
+
+
+def read_positions(starts, lengths):
+    # reference position of every base of the concatenated reads
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    shift = np.asarray(starts, dtype=np.int64) - offsets
+    return np.arange(lengths.sum(), dtype=np.int64) + np.repeat(shift, lengths)
+
+
+def phred_scores(qualities):
+    # FASTQ quality strings (or arrays) -> one concatenated array of scores
+    if isinstance(qualities[0], str):
+        raw = np.frombuffer("".join(qualities).encode("ascii"), dtype=np.uint8)
+        return raw.astype(np.float64) - PHRED_OFFSET
+    return np.concatenate([np.asarray(q, dtype=np.float64) for q in qualities])
+
+
+class Pileup:
+
+    def __init__(self, length):
+        self.length = length
+        self.counts = np.zeros((length, 5), dtype=np.int32)
+        self.weights = None
+        self.reads = 0
+        self.covered_positions = 0
+
+    def add_reads(self, starts, reads, qualities=None):
+        if not len(reads):
+            return
+        lengths = [len(r) for r in reads]
+        codes = encode("".join(reads) if isinstance(reads[0], str) else np.concatenate(reads))
+        pos = read_positions(starts, lengths)
+        inside = (pos >= 0) & (pos < self.length)
+        pos = pos[inside]
+        self.reads += len(reads)
+        if not len(pos):
+            return
+        flat = pos * 5 + codes[inside]
+        scores = None if qualities is None else phred_scores(qualities)[inside]
+        if qualities is not None and self.weights is None:
+            self.weights = np.zeros((self.length, 5), dtype=np.float64)
+
+        lo, hi = int(pos.min()), int(pos.max()) + 1
+        if hi - lo <= 4 * len(pos):
+            # sorted or local batch: one bincount over the positions it spans
+            span = slice(lo * 5, hi * 5)
+            added = np.bincount(flat - lo * 5, minlength=(hi - lo) * 5)
+            touched = lo + np.flatnonzero(added.reshape(-1, 5).any(axis=1))
+            self.count_new_positions(touched)
+            self.counts.reshape(-1)[span] += added.astype(np.int32)
+            if scores is not None:
+                self.weights.reshape(-1)[span] += np.bincount(flat - lo * 5, weights=scores,
+                                                              minlength=(hi - lo) * 5)
+        else:
+            # reads scattered over the genome: add base by base
+            self.count_new_positions(np.unique(pos))
+            np.add.at(self.counts.reshape(-1), flat, 1)
+            if scores is not None:
+                np.add.at(self.weights.reshape(-1), flat, scores)
+
+    def count_new_positions(self, touched):
+        self.covered_positions += int(np.count_nonzero(self.counts[touched].sum(axis=1) == 0))
+
+    def add(self, placed):
+        # list of (start, read) pairs, as produced by the read samplers
+        if placed:
+            starts, reads = zip(*placed)
+            self.add_reads(starts, list(reads))
+
+    def depth(self):
+        return self.counts.sum(axis=1)
+
+    def covered(self):
+        return self.covered_positions
+
+    def gaps(self):
+        # zero-coverage runs as (starts, ends)
+        empty = np.concatenate(([False], self.depth() == 0, [False]))
+        edges = np.flatnonzero(np.diff(empty.astype(np.int8)))
+        return edges[::2], edges[1::2]
+
+    def consensus(self, weighted=False, min_depth=1):
+        # majority (or summed base quality) call per position; N where nothing is called
+        if weighted and self.weights is None:
+            raise ValueError("No base qualities were added to this pileup")
+        support = self.weights if weighted else self.counts
+        calls = support[:, :4].argmax(axis=1).astype(np.uint8)
+        called = self.counts[:, :4].sum(axis=1) >= max(min_depth, 1)
+        calls[~called] = AMBIGUOUS
+        return decode(calls)
@@ -0,0 +1,138 @@
+# Primer candidate search over a whole genome.
+# Every start position and every length in [min_len, max_len] is scored at once:
+# nearest-neighbor Tm, GC%, GC clamp, longest homopolymer and 3' self-complementarity
+# are all computed as arrays over the candidates of one length, then the best
+# candidates of each region are kept.
+
+import numpy as np
+
+from bioinf.melting import tm_nearest_neighbor
+from bioinf.packed import AMBIGUOUS, decode, encode
+from bioinf.windows import window_starts
+
+
+def gc_cumsum(codes):
+    cum = np.zeros(len(codes) + 1, dtype=np.int32)
+    np.cumsum((codes == 1) | (codes == 2), out=cum[1:])
+    return cum
+
+
+def long_run_cumsum(codes, max_run):
+    # a run longer than max_run ends at i when codes[i - max_run .. i] are all equal
+    n = len(codes)
+    long_run = np.ones(max(n - max_run, 0), dtype=bool)
+    for j in range(1, max_run + 1):
+        long_run &= codes[max_run - j:n - j] == codes[max_run:]
+    cum = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(long_run, out=cum[max_run + 1:])
+    return cum
+
+
+def kmer_codes_forward(codes, k):
+    m = len(codes) - k + 1
+    out = np.zeros(max(m, 0), dtype=np.int64)
+    for j in range(k):
+        out = out << 2 | (codes[j:j + m] & 3)
+    return out
+
+
+def kmer_codes_revcomp(codes, k):
+    m = len(codes) - k + 1
+    out = np.zeros(max(m, 0), dtype=np.int64)
+    for j in range(k):
+        out |= (3 - (codes[j:j + m] & 3)).astype(np.int64) << 2 * j
+    return out
+
+
+def self_complementary_3prime(forward, revcomp, starts, length, k):
+    # True when the reverse complement of the last k bases occurs inside the primer,
+    # i.e. the 3' end can fold back (hairpin) or anneal to a second copy (self-dimer)
+    tail = revcomp[starts + length - k]
+    hit = np.zeros(len(starts), dtype=bool)
+    for offset in range(length - k + 1):
+        hit |= forward[starts + offset] == tail
+    return hit
+
+
+def score_length(codes, length, opts, tables):
+    starts = window_starts(len(codes), length)
+    if not len(starts):
+        return None
+
+    gc_cum = tables["gc"]
+    gc = (gc_cum[starts + length] - gc_cum[starts]) * 100 / length
+    tm = tm_nearest_neighbor(codes, length, na=opts["na"], dna_conc=opts["dna_conc"])
+    keep = ~np.isnan(tm)
+    keep &= (tm >= opts["tm_min"]) & (tm <= opts["tm_max"])
+    keep &= (gc >= opts["gc_min"]) & (gc <= opts["gc_max"])
+
+    if opts["gc_clamp"]:
+        last = codes[starts + length - 1]
+        clamp_gc = gc_cum[starts + length] - gc_cum[starts + length - min(5, length)]
+        keep &= ((last == 1) | (last == 2)) & (clamp_gc <= 3)
+
+    runs = tables["runs"]
+    keep &= runs[starts + length] == runs[starts + opts["max_homopolymer"]]
+
+    # the self-complementarity scan is the costly one, so it only sees survivors
+    starts, tm, gc = starts[keep], tm[keep], gc[keep]
+    keep = ~self_complementary_3prime(tables["forward"], tables["revcomp"], starts,
+                                      length, opts["self_comp_len"])
+    starts, tm, gc = starts[keep], tm[keep], gc[keep]
+    penalty = np.abs(tm - opts["tm_opt"]) + np.abs(gc - 50) / 10
+    return starts, np.full(len(starts), length), tm, gc, penalty
+
+
+def find_primers(seq, min_len=18, max_len=25, tm_min=52.0, tm_max=62.0, tm_opt=57.0,
+                 gc_min=40.0, gc_max=60.0, gc_clamp=True, max_homopolymer=4,
+                 self_comp_len=4, region_size=1000, top=5, strand="+",
+                 na=0.05, dna_conc=50e-9):
+    opts = {
+        "tm_min": tm_min, "tm_max": tm_max, "tm_opt": tm_opt, "gc_min": gc_min,
+        "gc_max": gc_max, "gc_clamp": gc_clamp, "max_homopolymer": max_homopolymer,
+        "self_comp_len": self_comp_len, "na": na, "dna_conc": dna_conc,
+    }
+    codes = encode(seq)
+    n = len(codes)
+    if strand == "-":
+        codes = np.where(codes < AMBIGUOUS, 3 - codes, codes)[::-1].astype(np.uint8)
+
+    tables = {
+        "gc": gc_cumsum(codes),
+        "runs": long_run_cumsum(codes, max_homopolymer),
+        "forward": kmer_codes_forward(codes, self_comp_len),
+        "revcomp": kmer_codes_revcomp(codes, self_comp_len),
+    }
+    columns = [score_length(codes, length, opts, tables)
+               for length in range(min_len, max_len + 1)]
+    columns = [c for c in columns if c is not None]
+    if not columns:
+        return []
+    starts, lengths, tm, gc, penalty = (np.concatenate(parts) for parts in zip(*columns))
+
+    # forward coordinates for both strands, then best `top` per region
+    if strand == "-":
+        starts = n - starts - lengths
+    region = starts // region_size
+    order = np.lexsort((penalty, region))
+    region_sorted = region[order]
+    first = np.searchsorted(region_sorted, region_sorted, side="left")
+    chosen = order[np.arange(len(order)) - first < top]
+    chosen = chosen[np.lexsort((penalty[chosen], region[chosen]))]
+
+    primers = []
+    for i in chosen.tolist():
+        s, length = int(starts[i]), int(lengths[i])
+        oligo = codes[n - s - length:n - s] if strand == "-" else codes[s:s + length]
+        primers.append({
+            "region": int(region[i]),
+            "start": s,
+            "end": s + length,
+            "length": length,
+            "strand": strand,
+            "sequence": decode(oligo),
+            "tm": float(tm[i]),
+            "gc": float(gc[i]),
+            "penalty": float(penalty[i]),
+        })
+    return primers
@@ -0,0 +1,145 @@
+# Exact repeated k-mers over a range of lengths.
+# The k-mers are 2-bit integer codes, each length rolled from the previous one (windows
+# touching an N are masked out), counted with a bincount (short k) or np.unique (long
+# k). Only k-mers seen at least twice are kept, and they are decoded to strings only
+# when they are reported. With bloom_fp set, the sequence is read in chunks instead:
+# a Bloom filter lets through only k-mers seen before, so singletons never reach the
+# count table, and a second pass counts the surviving candidates exactly.
+
+import numpy as np
+
+from bioinf.bloom import BloomFilter
+from bioinf.kmers import MAX_K, decode_kmers, encode_kmer, kmer_codes, use_dense
+from bioinf.packed import AMBIGUOUS, encode
+
+CHUNK_BASES = 1 << 16
+SMALL_K = 8
+
+
+def count_repeated(kmers, valid, k, min_count=2):
+    # (sorted codes, counts, first positions) of the k-mers occurring min_count+ times
+    positions = np.flatnonzero(valid)
+    kmers = kmers[positions]
+    if use_dense(k, len(kmers)):
+        counts = np.bincount(kmers.astype(np.int64), minlength=4 ** k)
+        repeated = np.flatnonzero(counts >= min_count)
+        first = np.full(4 ** k, len(valid), dtype=np.int64)
+        np.minimum.at(first, kmers.astype(np.int64), positions)
+        return repeated.astype(np.uint64), counts[repeated], first[repeated]
+    found, index, counts = np.unique(kmers, return_index=True, return_counts=True)
+    repeated = counts >= min_count
+    return found[repeated], counts[repeated], positions[index[repeated]]
+
+
+def chunk_kmers(codes, k, chunk_bases=CHUNK_BASES):
+    # (positions, codes) of the valid k-mers, one chunk at a time
+    for start in range(0, len(codes) - k + 1, chunk_bases):
+        kmers, valid = kmer_codes(codes[start:start + chunk_bases + k - 1], k)
+        positions = np.flatnonzero(valid)
+        yield positions + start, kmers[positions]
+
+
+def bloom_candidates(codes, k, fp_rate, chunk_bases=CHUNK_BASES):
+    # sorted k-mers seen at least twice, plus the singletons the filter mistook for
+    # repeats (about fp_rate of them)
+    bloom = BloomFilter(len(codes) - k + 1, fp_rate)
+    candidates = [np.zeros(0, dtype=np.uint64)]
+    for _, kmers in chunk_kmers(codes, k, chunk_bases):
+        found, counts = np.unique(kmers, return_counts=True)
+        candidates.append(found[(counts > 1) | bloom.contains(found)])
+        bloom.add(found)
+        if len(candidates) > 8:
+            candidates = [np.unique(np.concatenate(candidates))]
+    return np.unique(np.concatenate(candidates))
+
+
+def count_candidates(codes, k, candidates, min_count=2, chunk_bases=CHUNK_BASES):
+    # exact counts and first positions of the candidate k-mers, same triple as count_repeated
+    counts = np.zeros(len(candidates), dtype=np.int64)
+    first = np.full(len(candidates), len(codes), dtype=np.int64)
+    if len(candidates):
+        for positions, kmers in chunk_kmers(codes, k, chunk_bases):
+            idx = np.minimum(np.searchsorted(candidates, kmers), len(candidates) - 1)
+            hit = candidates[idx] == kmers
+            counts += np.bincount(idx[hit], minlength=len(candidates))
+            np.minimum.at(first, idx[hit], positions[hit])
+    repeated = counts >= min_count
+    return candidates[repeated], counts[repeated], first[repeated]
+
+
+def bloom_repeated(codes, k, min_count=2, fp_rate=0.01, chunk_bases=CHUNK_BASES):
+    # count_repeated in two chunked passes; short k-mers all fit in a 4^k table anyway
+    if k <= SMALL_K:
+        candidates = np.arange(4 ** k, dtype=np.uint64)
+    else:
+        candidates = bloom_candidates(codes, k, fp_rate, chunk_bases)
+    return count_candidates(codes, k, candidates, min_count, chunk_bases)
+
+
+class RepeatCounts:
+    # read-only Counter look-alike over the repeated k-mers of several lengths;
+    # ties in most_common keep Counter's order (shorter k first, then first occurrence)
+
+    def __init__(self, tables):
+        self.tables = {k: table for k, table in tables.items() if len(table[0])}
+
+    def __len__(self):
+        return sum(len(codes) for codes, _, _ in self.tables.values())
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, kmer):
+        # like Counter: anything that is not a plain ACGT k-mer (N, other IUPAC letters) is 0
+        table = self.tables.get(len(kmer))
+        if table is None or set(kmer.upper()) - set("ACGT"):
+            return 0
+        codes, counts, _ = table
+        code = np.uint64(encode_kmer(kmer))
+        i = np.searchsorted(codes, code)
+        return int(counts[i]) if i < len(codes) and codes[i] == code else 0
+
+    def __contains__(self, kmer):
+        return self[kmer] > 0
+
+    def most_common(self, n=None):
+        if not self.tables:
+            return []
+        ks = np.concatenate([np.full(len(t[0]), k) for k, t in self.tables.items()])
+        codes = np.concatenate([t[0] for t in self.tables.values()])
+        counts = np.concatenate([t[1] for t in self.tables.values()])
+        first = np.concatenate([t[2] for t in self.tables.values()])
+        order = np.lexsort((first, ks, -counts))[:n]
+        return [(decode_kmers(codes[i:i + 1], int(ks[i]))[0], int(counts[i])) for i in order]
+
+    def items(self):
+        return self.most_common()
+
+    def keys(self):
+        return [kmer for kmer, _ in self.most_common()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+def repeat_counts(seq, min_len=6, max_len=10, min_count=2, bloom_fp=None):
+    # k-mers of length k + 1 are rolled from those of length k by one shift and one OR;
+    # bloom_fp (e.g. 0.01) switches to the chunked two-pass count for large genomes and
+    # read sets (reads joined with N, as in assembly.join_reads)
+    codes = encode(seq)
+    if max_len > MAX_K:
+        raise ValueError(f"max_len must be at most {MAX_K}")
+    tables = {}
+    if len(codes) < min_len:
+        return RepeatCounts(tables)
+    if bloom_fp is not None and min_count >= 2:
+        for k in range(min_len, min(max_len, len(codes)) + 1):
+            tables[k] = bloom_repeated(codes, k, min_count, bloom_fp)
+        return RepeatCounts(tables)
+    kmers, valid = kmer_codes(codes, min_len)
+    for k in range(min_len, min(max_len, len(codes)) + 1):
+        tables[k] = count_repeated(kmers, valid, k, min_count)
+        if k < len(codes):
+            kmers = (kmers[:-1] << np.uint64(2)) | (codes[k:] & 3).astype(np.uint64)
+            valid = valid[:-1] & (codes[k:] != AMBIGUOUS)
+    return RepeatCounts(tables)
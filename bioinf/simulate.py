@@ -0,0 +1,208 @@
+# Read simulator with a simple sequencing error model.
+# Each batch draws read starts, lengths and strands as arrays from one seeded
+# generator, copies the reference bases with a single gather, applies substitutions,
+# insertions and deletions as flat masks over all bases of the batch, and reverse
+# complements minus-strand reads in place. Batches are streamed, so FASTQ files of
+# any size are written without holding the reads in memory.
+
+import gzip
+import math
+
+import numpy as np
+
+from bioinf.packed import AMBIGUOUS, decode, encode
+from bioinf.pileup import read_positions
+
+BATCH_READS = 100_000
+PHRED_OFFSET = 33
+
+
+def read_count(length, coverage, min_len, max_len, paired=False):
+    # reads needed for the requested mean coverage
+    per_read = (min_len + max_len) / 2
+    n = math.ceil(coverage * length / per_read)
+    return n + n % 2 if paired else n
+
+
+def add_errors(codes, read_id, rng, substitution_rate, insertion_rate, deletion_rate):
+    # flat codes of a batch -> mutated codes and their read ids
+    u = rng.random(len(codes))
+    substituted = (u < substitution_rate) & (codes < AMBIGUOUS)
+    codes[substituted] = (codes[substituted] + rng.integers(1, 4, substituted.sum())) % 4
+
+    u -= substitution_rate
+    deleted = (u >= 0) & (u < deletion_rate)
+    u -= deletion_rate
+    inserted = (u >= 0) & (u < insertion_rate)
+    if not deleted.any() and not inserted.any():
+        return codes, read_id
+
+    copies = (~deleted).astype(np.int64) + inserted
+    first = np.cumsum(copies) - copies
+    codes = np.repeat(codes, copies)
+    read_id = np.repeat(read_id, copies)
+    extra = first[inserted] + 1
+    codes[extra] = rng.integers(0, 4, len(extra))
+    return codes, read_id
+
+
+def reverse_reads(codes, read_id, lengths, reverse):
+    # reverse complement the reads flagged in reverse, within the flat batch
+    offsets = np.cumsum(lengths) - lengths
+    position = np.arange(len(codes)) - offsets[read_id]
+    flip = reverse[read_id]
+    source = np.where(flip, offsets[read_id] + lengths[read_id] - 1 - position, np.arange(len(codes)))
+    codes = codes[source]
+    complement = flip & (codes < AMBIGUOUS)
+    codes[complement] = 3 - codes[complement]
+    return codes
+
+
+def make_reads(ref, starts, lengths, reverse, rng, substitution_rate=0.0,
+               insertion_rate=0.0, deletion_rate=0.0):
+    # reads (as strings) for placed reference spans
+    read_id = np.repeat(np.arange(len(starts)), lengths)
+    codes = ref[read_positions(starts, lengths)]
+    codes, read_id = add_errors(codes, read_id, rng, substitution_rate, insertion_rate, deletion_rate)
+    out_lengths = np.bincount(read_id, minlength=len(starts))
+    codes = reverse_reads(codes, read_id, out_lengths, reverse)
+
+    text = decode(codes)
+    ends = np.cumsum(out_lengths)
+    return [text[a:b] for a, b in zip((ends - out_lengths).tolist(), ends.tolist())]
+
+
+def single_end(rng, n, length, min_len, max_len, reverse_fraction):
+    lengths = rng.integers(min_len, max_len + 1, n)
+    starts = rng.integers(0, length - lengths + 1)
+    reverse = rng.random(n) < reverse_fraction
+    return starts, lengths, reverse
+
+
+def tile_reference(starts, lengths, length, min_len):
+    # move the first reads onto starts 0, min_len, 2*min_len, ... with the last tile
+    # ending on the last base, so every position is covered at least once
+    tiles = math.ceil(max(length - min_len, 0) / min_len) + 1
+    if tiles > len(starts):
+        raise ValueError(f"Tiling the reference needs at least {tiles} reads")
+    starts[:tiles] = np.minimum(np.arange(tiles) * min_len, length - lengths[:tiles])
+    starts[tiles - 1] = length - lengths[tiles - 1]
+    return starts
+
+
+def paired_end(rng, pairs, length, min_len, max_len, insert_size, insert_sd):
+    # mate 1 at the fragment start on + and mate 2 at its end on -, or the other way round
+    lengths = rng.integers(min_len, max_len + 1, (pairs, 2))
+    fragment = np.rint(rng.normal(insert_size, insert_sd, pairs)).astype(np.int64)
+    fragment = np.clip(fragment, lengths.max(axis=1), length)
+    left = rng.integers(0, length - fragment + 1)
+    flipped = rng.random(pairs) < 0.5
+
+    starts = np.empty((pairs, 2), dtype=np.int64)
+    starts[:, 0] = np.where(flipped, left + fragment - lengths[:, 0], left)
+    starts[:, 1] = np.where(flipped, left, left + fragment - lengths[:, 1])
+    reverse = np.column_stack((flipped, ~flipped))
+    return starts.ravel(), lengths.ravel(), reverse.ravel()
+
+
+def simulate_batches(reference, n_reads=None, coverage=None, min_len=100, max_len=150,
+                     substitution_rate=0.0, insertion_rate=0.0, deletion_rate=0.0,
+                     reverse_fraction=0.5, paired=False, insert_size=400, insert_sd=40,
+                     tile=False, seed=None, batch_size=BATCH_READS):
+    # yields (starts, reverse flags, reads); in paired mode mates are adjacent (r1, r2, ...);
+    # tile=True lays the first single-end reads end to end over the whole reference
+    # (the rest stay random), so no base is left uncovered
+    ref = encode(reference)
+    max_len = min(max_len, len(ref))
+    min_len = min(min_len, max_len)
+    if n_reads is None:
+        if coverage is None:
+            raise ValueError("Give either n_reads or coverage")
+        n_reads = read_count(len(ref), coverage, min_len, max_len, paired)
+    if paired and n_reads % 2:
+        raise ValueError("Paired-end mode needs an even number of reads")
+    if paired and tile:
+        raise ValueError("Tiling is only available for single-end reads")
+
+    rng = np.random.default_rng(seed)
+    batch_size += batch_size % 2
+    errors = (substitution_rate, insertion_rate, deletion_rate)
+    for done in range(0, n_reads, batch_size):
+        n = min(batch_size, n_reads - done)
+        if paired:
+            starts, lengths, reverse = paired_end(rng, n // 2, len(ref), min_len, max_len,
+                                                  insert_size, insert_sd)
+        else:
+            starts, lengths, reverse = single_end(rng, n, len(ref), min_len, max_len,
+                                                  reverse_fraction)
+            if tile and done == 0:
+                starts = tile_reference(starts, lengths, len(ref), min_len)
+        yield starts, reverse, make_reads(ref, starts, lengths, reverse, rng, *errors)
+
+
+def sample_reads(reference, n_reads=None, coverage=None, **options):
+    # all reads in memory as (start, read) pairs, the format used by the Lab5 scripts
+    reads = []
+    for starts, _, batch in simulate_batches(reference, n_reads, coverage, **options):
+        reads.extend(zip(starts.tolist(), batch))
+    return reads
+
+
+def quality_char(substitution_rate, insertion_rate, deletion_rate):
+    error = max(substitution_rate + insertion_rate + deletion_rate, 1e-4)
+    return chr(PHRED_OFFSET + min(int(round(-10 * math.log10(error))), 40))
+
+
+def open_fastq(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", compresslevel=3)
+    return open(path, "w")
+
+
+def read_name(index, paired):
+    return f"sim{index // 2}/{index % 2 + 1}" if paired else f"sim{index}"
+
+
+def fastq_block(names, reads, quality):
+    return "".join(f"@{name}\n{read}\n+\n{quality * len(read)}\n" for name, read in zip(names, reads))
+
+
+def write_fastq(reference, path, mate_path=None, n_reads=None, coverage=None, **options):
+    # streams simulated reads to FASTQ; paired reads go to path/mate_path, or are
+    # interleaved in path when no mate_path is given. Names record the true origin.
+    paired = options.get("paired", False)
+    rates = [options.get(key, 0.0) for key in ("substitution_rate", "insertion_rate", "deletion_rate")]
+    quality = quality_char(*rates)
+    written = 0
+
+    out = open_fastq(path)
+    mates = open_fastq(mate_path) if paired and mate_path else None
+    try:
+        for starts, reverse, reads in simulate_batches(reference, n_reads, coverage, **options):
+            names = [read_name(written + i, paired) + f" pos={s} strand={'-' if r else '+'}"
+                     for i, (s, r) in enumerate(zip(starts.tolist(), reverse.tolist()))]
+            if mates is None:
+                out.write(fastq_block(names, reads, quality))
+            else:
+                out.write(fastq_block(names[0::2], reads[0::2], quality))
+                mates.write(fastq_block(names[1::2], reads[1::2], quality))
+            written += len(reads)
+    finally:
+        out.close()
+        if mates is not None:
+            mates.close()
+    return written
+
+
+def read_fastq(path):
+    # (name, read, quality) records
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        while True:
+            header = f.readline()
+            if not header:
+                break
+            read = f.readline().rstrip()
+            f.readline()
+            quality = f.readline().rstrip()
+            yield header[1:].rstrip(), read, quality
@@ -0,0 +1,114 @@
+# Per-genome restriction-site index.
+# Every enzyme of a catalogue is located once (one EnzymePanel scan per record) and
+# its sorted top-strand cut positions are kept as one flat array with per
+# (record, enzyme) offsets, saved as <fasta>.sites.npz. A single, double or multi
+# digest is then a merge of a few presorted slices: no rescan of the sequence.
+
+import os
+
+import numpy as np
+
+from bioinf.digest import ENZYMES, compiled_panel, fragment_lengths, panel_key
+from bioinf.fasta import read_fasta_records
+
+
+def sites_path(path):
+    return path + ".sites.npz"
+
+
+def panel_signature(enzymes):
+    return "|".join(f"{name}:{seq}:{top}:{bottom}" for name, seq, top, bottom in panel_key(enzymes))
+
+
+class SiteIndex:
+
+    def __init__(self, names, lengths, enzymes, positions, offsets, signature, path=None):
+        self.names = list(names)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.enzymes = list(enzymes)
+        self.positions = positions
+        self.offsets = offsets
+        self.signature = signature
+        self.path = path
+        self.enzyme_index = {name: i for i, name in enumerate(self.enzymes)}
+
+    @classmethod
+    def build(cls, records, enzymes=None):
+        # records: a sequence or (name, sequence) pairs
+        enzymes = enzymes or ENZYMES
+        if isinstance(records, (str, bytes, np.ndarray)):
+            records = [("", records)]
+        key = panel_key(enzymes)
+        panel = compiled_panel(key)
+
+        names, lengths, slices = [], [], []
+        for name, seq in records:
+            names.append(name.split()[0] if name.split() else "")
+            lengths.append(len(seq))
+            for enzyme, sites in panel.cut_sites(seq).items():
+                top = sites["top"]
+                slices.append(np.unique(top[(top > 0) & (top < len(seq))]))
+
+        sizes = [len(s) for s in slices]
+        offsets = np.zeros(len(slices) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        positions = np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+        return cls(names, lengths, panel.names, positions, offsets, panel_signature(enzymes))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, names=np.array(self.names), lengths=self.lengths,
+                     enzymes=np.array(self.enzymes), positions=self.positions,
+                     offsets=self.offsets, signature=np.array(self.signature))
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["names"].tolist(), data["lengths"], data["enzymes"].tolist(),
+                       data["positions"], data["offsets"], str(data["signature"]), path)
+
+    def record_number(self, record):
+        return self.names.index(record) if isinstance(record, str) else record
+
+    def enzyme_cuts(self, enzyme, record=0):
+        # sorted cut positions of one enzyme (a view into the index)
+        slot = self.record_number(record) * len(self.enzymes) + self.enzyme_index[enzyme]
+        return self.positions[self.offsets[slot]:self.offsets[slot + 1]]
+
+    def cuts(self, enzymes, record=0):
+        # merged sorted cut positions of an enzyme combination; the slices are already
+        # sorted, so the stable sort only merges runs
+        if isinstance(enzymes, str):
+            enzymes = [enzymes]
+        parts = [self.enzyme_cuts(name, record) for name in enzymes]
+        if len(parts) == 1:
+            return parts[0]
+        merged = np.sort(np.concatenate(parts), kind="stable")
+        keep = np.ones(len(merged), dtype=bool)
+        keep[1:] = merged[1:] != merged[:-1]
+        return merged[keep]
+
+    def digest(self, enzymes, record=0):
+        # fragment lengths of a single, double or multi digest of a linear record
+        return fragment_lengths(int(self.lengths[self.record_number(record)]), self.cuts(enzymes, record))
+
+    def counts(self, record=0):
+        # {enzyme: number of cuts}
+        base = self.record_number(record) * len(self.enzymes)
+        sizes = np.diff(self.offsets[base:base + len(self.enzymes) + 1])
+        return dict(zip(self.enzymes, sizes.tolist()))
+
+
+def genome_site_index(path, enzymes=None):
+    # load the saved index of a FASTA file, rebuilding it when missing, stale or built
+    # for a different enzyme catalogue
+    enzymes = enzymes or ENZYMES
+    saved = sites_path(path)
+    if os.path.exists(saved) and os.path.getmtime(saved) >= os.path.getmtime(path):
+        index = SiteIndex.load(saved)
+        if index.signature == panel_signature(enzymes):
+            return index
+    index = SiteIndex.build(read_fasta_records(path), enzymes)
+    index.save(saved)
+    return index
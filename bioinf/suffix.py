@@ -0,0 +1,178 @@
+# Suffix array, LCP array and maximal repeats of a whole genome.
+# The text is the sequence, a separator and its reverse complement, so inverted
+# repeats show up as ordinary repeats; ambiguous bases and the separator act as
+# unique symbols that match nothing. Suffixes are first ranked by their leading 32
+# bases (one uint64 code per position), then prefix doubling re-sorts only the groups
+# that are still tied. The LCP array is also compared 32 bases at a time, and repeats
+# are read off the runs of the LCP array that reach min_len.
+
+import numpy as np
+
+from bioinf.kmers import kmer_codes
+from bioinf.packed import AMBIGUOUS, decode, encode
+from bioinf.translate import revcomp_codes
+
+BLOCK = 32
+# the top 2*d bits of a 64-bit code, d = 0..32
+PREFIX_MASKS = np.array([((1 << 2 * d) - 1) << (64 - 2 * d) for d in range(BLOCK + 1)], dtype=np.uint64)
+
+
+def genome_text(seq, reverse_complement=True):
+    codes = encode(seq)
+    if not reverse_complement:
+        return codes
+    return np.concatenate((codes, np.array([AMBIGUOUS], dtype=np.uint8), revcomp_codes(codes)))
+
+
+def block_codes(text):
+    # 32-base code at every position plus the number of bases before the next unique
+    # symbol (capped at 32); bases past that symbol are zeroed so a suffix that stops
+    # early sorts before every suffix it is a prefix of. One extra slot for the end.
+    n = len(text)
+    padded = np.concatenate((text, np.full(BLOCK, AMBIGUOUS, dtype=np.uint8)))
+    codes = kmer_codes(padded, BLOCK)[0][:n + 1]
+
+    invalid = np.flatnonzero(padded == AMBIGUOUS)
+    positions = np.arange(n + 1)
+    distance = np.minimum(invalid[np.searchsorted(invalid, positions)] - positions, BLOCK)
+    codes &= PREFIX_MASKS[distance]
+    return codes, distance.astype(np.int8)
+
+
+def group_heads(keys):
+    # for sorted keys: index of the first element of each element's run of equal keys
+    n = len(keys[0])
+    change = np.zeros(n, dtype=bool)
+    change[:1] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.maximum.accumulate(np.where(change, np.arange(n), 0))
+
+
+def suffix_array(text, codes=None, distance=None):
+    # int32 slots and ranks keep a 5 Mbp genome (10 M suffixes with its reverse strand) small
+    n = len(text)
+    if codes is None:
+        codes, distance = block_codes(text)
+
+    # first 32 bases; a suffix that reaches a unique symbol is already unique
+    tie = np.where(distance[:n] < BLOCK, np.arange(n), -1)
+    sa = np.lexsort((tie, distance[:n], codes[:n])).astype(np.int32)
+    heads = group_heads((codes[sa], distance[sa], tie[sa])).astype(np.int32)
+    del tie
+    rank = np.empty(n + 1, dtype=np.int32)
+    rank[sa] = heads
+    rank[n] = -1
+
+    h = BLOCK
+    while True:
+        same = heads[1:] == heads[:-1]
+        tied = np.zeros(n, dtype=bool)
+        tied[1:] |= same
+        tied[:-1] |= same
+        slots = np.flatnonzero(tied)
+        if not len(slots):
+            return sa
+        members = sa[slots]
+        first = rank[members]
+        second = rank[np.minimum(members.astype(np.int64) + h, n)]
+        order = np.lexsort((second, first))
+        sa[slots] = members[order]
+        heads[slots] = slots[group_heads((first[order], second[order]))]
+        rank[sa[slots]] = heads[slots]
+        h *= 2
+
+
+def equal_bases(x):
+    # leading 2-bit symbols that are zero in x (32 when x == 0)
+    hi = np.frexp((x >> np.uint64(32)).astype(np.float64))[1]
+    lo = np.frexp((x & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+    return (2 * BLOCK - np.where(hi > 0, hi + 32, lo)) // 2
+
+
+def lcp_array(text, sa, codes=None, distance=None):
+    # lcp[i] = common prefix of suffixes sa[i - 1] and sa[i]; lcp[0] = 0
+    if codes is None:
+        codes, distance = block_codes(text)
+    lcp = np.zeros(len(sa), dtype=np.int32)
+    pending = np.arange(1, len(sa))
+    while len(pending):
+        p = np.minimum(sa[pending] + lcp[pending], len(text))
+        q = np.minimum(sa[pending - 1] + lcp[pending], len(text))
+        full = (codes[p] == codes[q]) & (distance[p] == BLOCK) & (distance[q] == BLOCK)
+        p, q, done = p[~full], q[~full], pending[~full]
+        lcp[done] += np.minimum(equal_bases(codes[p] ^ codes[q]), np.minimum(distance[p], distance[q]))
+        pending = pending[full]
+        lcp[pending] += BLOCK
+    return lcp
+
+
+def preceding_symbols(text, sa):
+    # base before each suffix; unique symbols and the text start get values of their own
+    before = text[np.maximum(sa - 1, 0)].astype(np.int64)
+    unique = np.flatnonzero((sa == 0) | (before == AMBIGUOUS))
+    before[unique] = AMBIGUOUS + np.arange(len(unique))
+    return before
+
+
+def lcp_intervals(lcp, min_len):
+    # (length, first slot, last slot) of every lcp-interval of length >= min_len; only
+    # the runs of the LCP array that reach min_len are walked
+    high = np.concatenate(([0], lcp >= min_len, [0])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(high))
+    for run_start, run_end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+        stack = []
+        for i, value in enumerate(lcp[run_start:run_end].tolist() + [0], start=run_start):
+            lb = i - 1
+            while stack and value < stack[-1][0]:
+                length, lb = stack.pop()
+                yield length, lb, i - 1
+            if value >= min_len and (not stack or value > stack[-1][0]):
+                stack.append((value, lb))
+
+
+def forward_positions(starts, length, n):
+    # suffix starts in the text -> (start, strand) on the forward sequence
+    return sorted({(s, "+") if s < n else (2 * n + 1 - s - length, "-") for s in starts})
+
+
+def find_repeats(seq, min_len=20, supermaximal=False, reverse_complement=True, max_repeats=None):
+    # maximal exact repeats of at least min_len bases, longest first, as dicts with
+    # length, copies, sequence and positions [(start, strand)]; strands are given
+    # relative to the copy with the smallest start. supermaximal=True keeps only the
+    # repeats that are not contained in another repeat.
+    n = len(seq)
+    text = genome_text(seq, reverse_complement)
+    codes, distance = block_codes(text)
+    sa = suffix_array(text, codes, distance)
+    lcp = lcp_array(text, sa, codes, distance)
+    del codes, distance
+
+    before = preceding_symbols(text, sa)
+    changes = np.concatenate(([0], np.cumsum(before[1:] != before[:-1])))
+
+    repeats, seen = [], set()
+    for length, first, last in lcp_intervals(lcp, min_len):
+        # left-maximal: the copies are not all preceded by the same base
+        if changes[last] == changes[first]:
+            continue
+        if supermaximal:
+            if lcp[first + 1:last + 1].max() > length:
+                continue
+            if len(np.unique(before[first:last + 1])) < last - first + 1:
+                continue
+        positions = forward_positions(sa[first:last + 1].tolist(), length, n)
+        starts = frozenset(start for start, _ in positions)
+        if len(starts) < 2 or (length, starts) in seen:
+            continue
+        seen.add((length, starts))
+        if positions[0][1] == "-":
+            positions = [(start, "+" if strand == "-" else "-") for start, strand in positions]
+        repeats.append({"length": length, "copies": len(starts), "positions": positions})
+
+    repeats.sort(key=lambda r: (-r["length"], r["positions"][0][0]))
+    repeats = repeats[:max_repeats]
+    for r in repeats:
+        start = r["positions"][0][0]
+        r["sequence"] = decode(text[start:start + r["length"]])
+    return repeats
@@ -0,0 +1,107 @@
+# Tandem repeats (microsatellites and longer units) in one pass over the codes.
+# For every period p the sequence is compared with itself shifted by p; a window of
+# min_copies units whose positions match at least `purity` of the time marks a tandem
+# run, and overlapping good windows are merged into one repeat. Periods are tried from
+# short to long, so ATATAT is reported once with period 2 and not again as 4 or 6.
+# The sequence is scanned chunk by chunk and repeats are yielded in start order; runs
+# that reach the end of a chunk are held back and found again in the next one.
+
+import numpy as np
+
+from bioinf.packed import AMBIGUOUS, LETTERS, encode
+
+CHUNK_BASES = 1 << 20
+MAX_PERIOD = 50
+
+
+def window_length(period, min_copies, min_length):
+    # matches a window must span: (copies - 1) units, and at least min_length bases in all
+    return max(period * (min_copies - 1), min_length - period, 1)
+
+
+def period_runs(codes, period, width, purity):
+    # (start, end) of the merged windows where codes[i] == codes[i + period] often
+    # enough; end is exclusive and both ends sit on a matching position
+    n = len(codes) - period - width + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    match = (codes[:-period] == codes[period:]) & (codes[:-period] < AMBIGUOUS)
+    matched = np.concatenate(([0], np.cumsum(match)))
+    good = np.flatnonzero(matched[width:width + n] - matched[:n] >= purity * width)
+
+    cover = np.bincount(good, minlength=len(match) + 1) - np.bincount(good + width, minlength=len(match) + 1)
+    inside = np.concatenate(([0], np.cumsum(cover[:-1]) > 0, [0])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(inside))
+    starts, ends = edges[::2], edges[1::2]
+
+    # trim each run to its first and last matching position
+    hits = np.flatnonzero(match)
+    starts = hits[np.searchsorted(hits, starts)]
+    ends = hits[np.searchsorted(hits, ends) - 1] + 1
+    return starts, ends
+
+
+def consensus_unit(codes, period):
+    # majority base at each phase of the unit
+    phase = np.arange(len(codes)) % period
+    votes = np.bincount(phase * 5 + codes, minlength=period * 5).reshape(period, 5)
+    return LETTERS[votes[:, :4].argmax(axis=1)].tobytes().decode("ascii")
+
+
+def chunk_repeats(codes, max_period, min_copies, min_length, purity):
+    # every tandem repeat in one chunk, in chunk coordinates, shortest periods first
+    owner = np.zeros(len(codes), dtype=np.int32)
+    found = []
+    for period in range(1, max_period + 1):
+        width = window_length(period, min_copies, min_length)
+        starts, ends = period_runs(codes, period, width, purity)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            stop = end + period
+            # skip runs already explained by a period that divides this one
+            earlier = owner[start:stop]
+            if (period % earlier[earlier > 0] == 0).sum() * 2 >= stop - start:
+                continue
+            found.append((start, stop, period, end - start))
+            owner[start:stop] = np.where(owner[start:stop] == 0, period, owner[start:stop])
+    return found
+
+
+def tandem_repeats(seq, max_period=MAX_PERIOD, min_copies=3, min_length=12, purity=0.9,
+                   chunk_bases=CHUNK_BASES):
+    # yields dicts with start, end (exclusive), period, copies, purity and consensus,
+    # ordered by start; only one chunk of candidates is held at a time
+    codes = encode(seq)
+    n = len(codes)
+    margin = max(window_length(p, min_copies, min_length) + 2 * p for p in range(1, max_period + 1))
+    emitted = {}
+    start, size = 0, max(chunk_bases, 4 * margin)
+    while start < n:
+        stop = min(n, start + size)
+        chunk = codes[start:stop]
+        found = chunk_repeats(chunk, max_period, min_copies, min_length, purity)
+
+        # runs near the end of the chunk may continue: resume at the first of them
+        resume = stop
+        if stop < n:
+            open_starts = [s for s, e, _, _ in found if e >= len(chunk) - margin]
+            resume = start + min(open_starts, default=len(chunk) - margin)
+            if resume <= start:
+                size *= 2
+                continue
+
+        for s, e, period, span in sorted(found):
+            s, e = s + start, e + start
+            if s >= resume or s < emitted.get(period, 0):
+                continue
+            emitted[period] = e
+            region = codes[s:e]
+            matches = int(((region[:-period] == region[period:]) & (region[:-period] < AMBIGUOUS)).sum())
+            yield {
+                "start": s,
+                "end": e,
+                "period": period,
+                "copies": round((e - s) / period, 1),
+                "purity": round(matches / span, 3),
+                "consensus": consensus_unit(region, period),
+            }
+        start, size = resume, max(chunk_bases, 4 * margin)
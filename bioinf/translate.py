@@ -0,0 +1,93 @@
+# Codon translation with lookup tables.
+# Codons are turned into indices 0..63 (16*b1 + 4*b2 + b3 with A=0 C=1 G=2 T=3,
+# 64 for codons with an ambiguous base) and a whole frame is translated with one
+# array lookup. Genetic codes use the NCBI translation table numbers.
+
+import numpy as np
+
+from bioinf.packed import AMBIGUOUS, BASES, encode
+
+# amino acids in NCBI order (first, second, third base each running over T, C, A, G)
+NCBI_CODES = {
+    1: "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+    2: "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSS**VVVVAAAADDEEGGGG",
+    3: "FFLLSSSSYY**CCWWTTTTPPPPHHQQRRRRIIMMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+    4: "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+    5: "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSSSSVVVVAAAADDEEGGGG",
+    6: "FFLLSSSSYYQQCC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+    9: "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNNKSSSSVVVVAAAADDEEGGGG",
+    11: "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+}
+NCBI_ORDER = "TCAG"
+
+THREE_LETTER = {
+    "A": "Ala", "R": "Arg", "N": "Asn", "D": "Asp", "C": "Cys", "Q": "Gln", "E": "Glu",
+    "G": "Gly", "H": "His", "I": "Ile", "L": "Leu", "K": "Lys", "M": "Met", "F": "Phe",
+    "P": "Pro", "S": "Ser", "T": "Thr", "W": "Trp", "Y": "Tyr", "V": "Val",
+    "*": "Stop", "X": "???",
+}
+
+FRAMES = (1, 2, 3, -1, -2, -3)
+
+
+def codon_name(index):
+    return BASES[index // 16] + BASES[index // 4 % 4] + BASES[index % 4]
+
+
+def codon_table(table=1):
+    # 65 one-letter amino acids as bytes, the last one (X) for ambiguous codons
+    if table not in NCBI_CODES:
+        raise ValueError(f"unknown genetic code {table}; known: {sorted(NCBI_CODES)}")
+    amino = NCBI_CODES[table]
+    out = np.full(65, ord("X"), dtype=np.uint8)
+    for i in range(64):
+        b1, b2, b3 = (NCBI_ORDER.index(b) for b in codon_name(i))
+        out[i] = ord(amino[16 * b1 + 4 * b2 + b3])
+    return out
+
+
+def genetic_code(table=1, three_letter=True):
+    # {codon: amino acid} in the style of the L4 dictionaries
+    letters = codon_table(table)
+    return {codon_name(i): THREE_LETTER[chr(letters[i])] if three_letter else chr(letters[i])
+            for i in range(64)}
+
+
+def revcomp_codes(codes):
+    return np.where(codes < AMBIGUOUS, 3 - codes, codes)[::-1].astype(np.uint8)
+
+
+def codon_indices(codes, frame=0):
+    # frame 0, 1 or 2 on the given strand
+    m = (len(codes) - frame) // 3
+    if m <= 0:
+        return np.zeros(0, dtype=np.int64)
+    c = codes[frame:frame + 3 * m].reshape(m, 3).astype(np.int64)
+    idx = c[:, 0] * 16 + c[:, 1] * 4 + c[:, 2]
+    idx[(c == AMBIGUOUS).any(axis=1)] = 64
+    return idx
+
+
+def frame_codes(seq, frame):
+    codes = encode(seq)
+    if frame < 0:
+        return revcomp_codes(codes), -frame - 1
+    return codes, frame - 1
+
+
+def translate(seq, frame=1, table=1, three_letter=False, to_stop=False):
+    # frame is 1, 2, 3 on the given strand or -1, -2, -3 on the reverse complement
+    if frame not in FRAMES:
+        raise ValueError("frame must be one of 1, 2, 3, -1, -2, -3")
+    codes, offset = frame_codes(seq, frame)
+    protein = codon_table(table)[codon_indices(codes, offset)].tobytes().decode("ascii")
+    if to_stop:
+        protein = protein.split("*", 1)[0]
+    if three_letter:
+        return "-".join(THREE_LETTER[aa] for aa in protein)
+    return protein
+
+
+def six_frame_translation(seq, table=1, three_letter=False):
+    codes = encode(seq)
+    return {frame: translate(codes, frame, table, three_letter) for frame in FRAMES}
@@ -0,0 +1,113 @@
+# Sliding-window statistics from prefix sums.
+# A cumulative count per symbol is built once, after which every window's count is
+# one subtraction, so a profile costs O(n) for any window size and step and no
+# window is ever sliced out as a string.
+
+from itertools import chain, groupby
+
+import numpy as np
+
+from bioinf.fasta import CHUNK_SIZE, read_fasta_chunks
+from bioinf.packed import BASES, LETTERS, PackedSequence
+
+COUNT_DTYPE = np.int32
+
+
+def as_bytes(seq):
+    if isinstance(seq, PackedSequence):
+        return np.frombuffer(str(seq).encode("ascii"), dtype=np.uint8)
+    if isinstance(seq, np.ndarray):
+        return LETTERS[seq]
+    if isinstance(seq, str):
+        seq = seq.upper().encode("latin-1", "replace")
+    return np.frombuffer(seq, dtype=np.uint8)
+
+
+def symbol_indices(seq, alphabet=BASES):
+    # index of each position in the alphabet, len(alphabet) for anything else
+    table = np.full(256, len(alphabet), dtype=np.uint8)
+    for i, letter in enumerate(alphabet):
+        table[ord(letter.upper())] = i
+        table[ord(letter.lower())] = i
+    return table[as_bytes(seq)]
+
+
+def window_starts(n, window, step=1):
+    return np.arange(0, max(n - window + 1, 0), step)
+
+
+def counts_at(indices, starts, window, nsymbols):
+    counts = np.empty((len(starts), nsymbols), dtype=COUNT_DTYPE)
+    for s in range(nsymbols):
+        cum = np.zeros(len(indices) + 1, dtype=COUNT_DTYPE)
+        np.cumsum(indices == s, out=cum[1:])
+        counts[:, s] = cum[starts + window] - cum[starts]
+    return counts
+
+
+def window_counts(seq, window, step=1, alphabet=BASES):
+    indices = symbol_indices(seq, alphabet)
+    starts = window_starts(len(indices), window, step)
+    return starts, counts_at(indices, starts, window, len(alphabet))
+
+
+def window_frequencies(seq, window, step=1, alphabet=BASES):
+    # {symbol: relative frequency in each window}
+    _, counts = window_counts(seq, window, step, alphabet)
+    return {letter: counts[:, i] / window for i, letter in enumerate(alphabet)}
+
+
+def gc_profile(seq, window, step=1):
+    _, counts = window_counts(seq, window, step, "CG")
+    return (counts[:, 0] + counts[:, 1]) * 100 / window
+
+
+def kappa_ic_profile(seq, window, step=1):
+    # Kappa index of coincidence per window: for every shift d the number of
+    # positions with seq[i] == seq[i + d] inside the window comes from a prefix sum
+    # over the whole sequence
+    raw = as_bytes(seq)
+    starts = window_starts(len(raw), window, step)
+    total = np.zeros(len(starts))
+    for shift in range(1, window):
+        cum = np.zeros(len(raw) - shift + 1, dtype=COUNT_DTYPE)
+        np.cumsum(raw[:-shift] == raw[shift:], out=cum[1:])
+        length = window - shift
+        total += (cum[starts + length] - cum[starts]) / length * 100
+    return total / (window - 1)
+
+
+def stream_window_counts(chunks, window, step=1, alphabet=BASES):
+    # chunks are consecutive pieces of one sequence; yields (starts, counts) per piece,
+    # keeping only the last window-1 symbols between pieces
+    tail = np.zeros(0, dtype=np.uint8)
+    offset = 0
+    next_start = 0
+
+    for chunk in chunks:
+        indices = symbol_indices(chunk, alphabet)
+        if next_start > offset + len(tail):
+            # step larger than the window: drop what lies before the next window
+            skip = min(next_start - offset - len(tail), len(indices))
+            indices = indices[skip:]
+            offset += len(tail) + skip
+            tail = np.zeros(0, dtype=np.uint8)
+        buf = np.concatenate((tail, indices))
+
+        starts = np.arange(next_start - offset, len(buf) - window + 1, step)
+        if len(starts):
+            yield starts + offset, counts_at(buf, starts, window, len(alphabet))
+            next_start = offset + int(starts[-1]) + step
+
+        keep = min(next_start - offset, len(buf))
+        tail = buf[keep:]
+        offset += keep
+
+
+def fasta_window_counts(path, window, step=1, alphabet=BASES, chunk_size=CHUNK_SIZE):
+    # streams (header, starts, counts) for every record of a FASTA file
+    for _, record in groupby(read_fasta_chunks(path, chunk_size), key=lambda r: r[0]):
+        _, header, first = next(record)
+        pieces = chain([first], (piece for _, _, piece in record))
+        for starts, counts in stream_window_counts(pieces, window, step, alphabet):
+            yield header, starts, counts